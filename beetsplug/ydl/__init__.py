@@ -0,0 +1,2164 @@
+# -*- coding: utf-8 -*-
+# Copyright 2016, Vinicius Massuchetto.
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+
+from beets import config
+from beets import ui
+from beets import util
+from beets.plugins import BeetsPlugin
+from beetsplug.ydl import fingerprint
+from beetsplug.ydl import journal
+from beetsplug.ydl import loudness
+from beetsplug.ydl import silence
+from beetsplug.ydl import tracklist
+from beetsplug.ydl.session import Session
+from beetsplug.ydl.shard import FileLock, in_shard, parse_shard
+from beetsplug.ydl.stats import Stats
+from beetsplug.ydl.watch import Lock, Scheduler
+from beetsplug.ydl.workqueue import WorkQueue
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from optparse import OptionParser
+from pathlib import Path
+from shutil import copyfile
+from hashlib import md5
+import collections
+import copy
+import cProfile
+import json
+import os
+import queue
+import shutil
+import socket
+import subprocess
+import sys
+import threading
+import time
+import uuid
+import wave
+
+class Colors():
+    INFO = '\033[94m'
+    SUCCESS = '\033[92m'
+    WARNING = '\033[93m'
+    BOLD = '\033[1m'
+    END = '\033[0m'
+
+class Pipeline():
+    """Pass items through a sequence of stages running concurrently
+
+    Stages are connected by bounded queues, so a slow stage holds the ones
+    before it instead of piling up items. Each stage has its own number of
+    worker threads. A stage function returns the item for the next stage, or
+    `None` to drop it.
+    """
+    def __init__(self, queue_size=4, verbose=False):
+        self.queue_size = queue_size
+        self.verbose = verbose
+        self.stages = []
+        self.lock = threading.Lock()
+
+    def add_stage(self, name, func, workers=1):
+        self.stages.append({
+            'name': name,
+            'func': func,
+            'workers': max(1, int(workers)),
+            'queue': queue.Queue(self.queue_size),
+            'threads': [],
+            'count': 0,
+            'time': 0.0,
+        })
+
+    def run(self, items):
+        """Feed `items` to the first stage and wait for all stages to finish
+
+        When reading `items` fails, the items already fed are still finished
+        before the error is raised.
+        """
+        start = time.time()
+        for index, stage in enumerate(self.stages):
+            for i in range(stage['workers']):
+                thread = threading.Thread(target=self.work,
+                    args=(index,), daemon=True)
+                thread.start()
+                stage['threads'].append(thread)
+
+        try:
+            for item in items:
+                self.stages[0]['queue'].put(item)
+        finally:
+            for stage in self.stages:
+                for thread in stage['threads']:
+                    stage['queue'].put(None)
+                for thread in stage['threads']:
+                    thread.join()
+
+        if self.verbose:
+            self.print_summary(time.time() - start)
+
+    def work(self, index):
+        stage = self.stages[index]
+        while True:
+            item = stage['queue'].get()
+            if item is None:
+                return
+
+            start = time.time()
+            try:
+                item = stage['func'](item)
+            except Exception as e:
+                print("[ydl] Error: %s stage failed: %s" % (stage['name'], e))
+                item = None
+            elapsed = time.time() - start
+
+            with self.lock:
+                stage['count'] += 1
+                stage['time'] += elapsed
+
+            if self.verbose:
+                print("[ydl] %s done in %.1fs (%s)" % (stage['name'],
+                    elapsed, self.get_queue_depths()))
+
+            if item is not None and index + 1 < len(self.stages):
+                self.stages[index + 1]['queue'].put(item)
+
+    def get_queue_depths(self):
+        return ', '.join('%s: %d' % (stage['name'], stage['queue'].qsize())
+            for stage in self.stages)
+
+    def print_summary(self, elapsed):
+        for stage in self.stages:
+            print("[ydl] %s: %d items, %.1fs busy, %.2f items/s" % (
+                stage['name'], stage['count'], stage['time'],
+                stage['count'] / elapsed if elapsed > 0 else 0))
+
+class YdlPlugin(BeetsPlugin):
+    """A plugin for downloading music from YouTube and importing into beets.
+
+    It tries to split album files if it can identify track times somewhere.
+    """
+    def __init__(self, *args, **kwargs):
+        """Set default values
+
+        `self.config['youtubedl_options']` is a dict with a lot of options
+        available from youtube-dl: https://git.io/fN0c7, its defaults are only
+        built when needed by `get_youtubedl_options`.
+        """
+        super(YdlPlugin, self).__init__()
+
+        self.search_query = "https://www.youtube.com/results?search_query="
+        self.config_dir = config.config_dir()
+        self.cache_dir = self.config_dir + "/ydl-cache"
+        self.outtmpl = self.cache_dir + "/%(id)s/%(id)s.%(ext)s"
+        self.info_cache_dir = self.cache_dir + "/.info"
+        self.incremental_file = self.cache_dir + "/.incremental.json"
+        self.journal_file = self.config_dir + "/ydl-journal.db"
+        self.lock_file = self.config_dir + "/ydl.lock"
+        self.queue_file = self.config_dir + "/ydl-queue.db"
+        self.fingerprint_file = self.config_dir + "/ydl-fingerprints.db"
+        self.entry_lock_dir = self.cache_dir + "/.locks"
+
+        # Default options
+        self._config = {
+            'urls': [],
+            'verbose': False,
+            'jobs': 1,
+            'pipeline': False,
+            'resolve_jobs': 2,
+            'split_jobs': 1,
+            'queue_size': 4,
+            'cache_size': 0,
+            'batch_import': False,
+            'import_batch_size': 0,
+            'info_cache_ttl': 0,
+            'incremental': False,
+            'passthrough': False,
+            'stream_split': False,
+            'detect_silence': False,
+            'silence_threshold': -45,
+            'watch_interval': 3600,
+            'watch_jitter': 0.1,
+            'watch_max_backoff': 86400,
+            'shard': None,
+            'cache_locks': False,
+            'lock_ttl': 21600,
+            'priority': 0,
+            'loudness': False,
+            'fingerprint': False,
+        }
+        self._config.update(self.config.flatten())
+        self.config = self._config
+
+        self.import_lock = threading.Lock()
+        self.import_queue = []
+        self.import_ids = {}
+        self.library_ids = None
+        self.session = None
+        self.stats = Stats()
+        self.stdout = sys.stdout
+        self.journal = None
+        self.stage = None
+        self.streaming = False
+        self.shard = None
+        self.entry_locks = {}
+        self.extractors = None
+        self.fingerprints = None
+
+        self.register_listener('import_task_files', self.import_task_files)
+
+        # be verbose if beets is verbose
+        if not self.config.get('verbose'):
+            self.config['verbose'] = True
+
+    def commands(self):
+        outer_class = self
+
+        def run(lib, opts, args):
+            """Run `beet ydl` once its options are set
+            """
+            outer_class.stats = Stats(self.config.get('verbose'))
+            outer_class.session = None
+
+            if self.config.get('shard'):
+                try:
+                    outer_class.shard = parse_shard(
+                        str(self.config.get('shard')))
+                except ValueError as e:
+                    raise ui.UserError(str(e))
+
+            profile = None
+            if self.config.get('profile'):
+                profile = cProfile.Profile()
+                profile.enable()
+
+            # watching and polling the default urls are meant to run
+            # unattended, so they don't overlap with other runs doing the same
+            lock = None
+            if self.config.get('watch') or (len(args) == 0 and \
+                not self.config.get('flat') and \
+                not self.config.get('batch_file') and \
+                not self.config.get('drain')):
+                lock = Lock(outer_class.lock_file)
+                if not lock.acquire():
+                    raise ui.UserError('Another `beet ydl` is already ' + \
+                        'running, see ' + outer_class.lock_file)
+
+            outer_class.journal = journal.Journal(outer_class.journal_file)
+            if self.config.get('fingerprint'):
+                outer_class.get_fingerprint_cache()
+
+            try:
+                outer_class.lib = lib
+                outer_class.library_ids = outer_class.load_library_ids(lib)
+
+                if self.config.get('flat'):
+                    for arg in args or self.config.get('urls') or []:
+                        if not outer_class.list_flat(lib, str(arg)):
+                            exit(1)
+                elif self.config.get('watch'):
+                    outer_class.watch(lib, opts,
+                        args or [str(url) for url in self.config.get('urls')])
+                elif self.config.get('batch_file') or \
+                    self.config.get('drain'):
+                    outer_class.run_queue(lib, opts)
+                elif len(args) > 0:
+                    for arg in args:
+                        if not outer_class.youtubedl(lib, opts, arg):
+                            exit(1)
+                elif self.config.get('urls') is not None:
+                    if self.config.get('verbose'):
+                        print("[ydl] Falling back to default urls")
+                    for url in self.config.get('urls'):
+                        if not outer_class.youtubedl(lib, opts, str(url),
+                            cache=True):
+                            exit(1)
+
+                outer_class.flush_imports()
+                outer_class.evict_cache()
+            finally:
+                outer_class.journal.close()
+                if outer_class.fingerprints is not None:
+                    outer_class.fingerprints.close()
+                    outer_class.fingerprints = None
+                for entry_id in list(outer_class.entry_locks):
+                    outer_class.unlock_entry(entry_id)
+                if lock is not None:
+                    lock.release()
+                if profile is not None:
+                    profile.disable()
+                    profile.dump_stats(self.config.get('profile'))
+
+        def ydl_func(lib, opts, args):
+            """Parse args and download one source at a time to pass it to
+            beets
+            """
+            for opt, value in opts.__dict__.items():
+                if value is not None:
+                    self.config[opt] = value
+
+            if self.config.get('cache_stats'):
+                outer_class.print_cache_stats()
+                return
+
+            # with stats on the standard output, everything else goes to the
+            # standard error, so they can be read by another program
+            outer_class.stdout = sys.stdout
+            if self.config.get('stats') and \
+                not self.config.get('stats_file'):
+                sys.stdout = sys.stderr
+            try:
+                run(lib, opts, args)
+            finally:
+                sys.stdout = outer_class.stdout
+
+            if self.config.get('stats'):
+                outer_class.write_stats()
+
+        parser = OptionParser()
+        parser.add_option("--no-download", action="store_false",
+            default=True, dest="download", help="don't actually " + \
+                "download files, only the descriptions")
+        parser.add_option("--no-split-files", action="store_false",
+            default=True, dest="split_files", help="don't try " + \
+                "to split files when an album is identified")
+        parser.add_option("--no-import", action="store_false",
+            default=True, dest="import", help="do not import into " + \
+                "beets after downloading and processing")
+        parser.add_option("-f", "--force-download", action="store_true",
+            default=False, dest="force_download", help="always download " + \
+                "and overwrite files")
+        parser.add_option("-k", "--keep-files", action="store_true",
+            default=False, dest="keep_files", help="keep the files " + \
+                "downloaded on cache, useful for caching or bulk importing")
+        parser.add_option("-w", "--write-dummy-mp3", action="store_true",
+            default=False, dest="write_dummy_mp3", help="write blank " + \
+                "dummy mp3 files with valid ID3 information")
+        parser.add_option("-b", "--batch-import", action="store_true",
+            default=None, dest="batch_import", help="import into beets " + \
+                "in batches from within this process instead of running " + \
+                "`beet import` for every item")
+        parser.add_option("-j", "--jobs", type="int", dest="jobs",
+            default=None, help="number of playlist entries to download " + \
+                "and process concurrently")
+        parser.add_option("-i", "--incremental", action="store_true",
+            default=None, dest="incremental", help="stop reading " + \
+                "playlists at the newest entry processed on the last run")
+        parser.add_option("--resume", action="store_true",
+            default=None, dest="resume", help="continue entries from " + \
+                "the last stage they completed on previous runs")
+        parser.add_option("-r", "--refresh", action="store_true",
+            default=None, dest="refresh", help="don't use cached " + \
+                "information for the default urls")
+        parser.add_option("-p", "--pipeline", action="store_true",
+            default=None, dest="pipeline", help="resolve, download, " + \
+                "split and import entries in overlapping stages")
+        parser.add_option("--cache-stats", action="store_true",
+            default=None, dest="cache_stats", help="print information " + \
+                "about the files kept on cache and exit")
+        parser.add_option("--stats", type="choice", choices=["json"],
+            default=None, dest="stats", help="write per-entry and " + \
+                "per-run timings in the given format (json)")
+        parser.add_option("--stats-file", default=None, dest="stats_file",
+            help="file to write --stats to, instead of the standard output")
+        parser.add_option("--profile", default=None, dest="profile",
+            help="profile the run with cProfile and write its stats " + \
+                "to the given file")
+        parser.add_option("-n", "--native-codec", action="store_true",
+            default=None, dest="passthrough", help="keep the audio " + \
+                "codec of the source instead of converting it to mp3")
+        parser.add_option("-s", "--stream-split", action="store_true",
+            default=None, dest="stream_split", help="split tracks " + \
+                "while downloading when the description has a tracklist")
+        parser.add_option("--flat", action="store_true", default=None,
+            dest="flat", help="only list the entries of the sources " + \
+                "as JSON lines, reading descriptions of the ones not " + \
+                "in the library")
+        parser.add_option("--shard", default=None, dest="shard",
+            help="only process the entries of shard i/N, to spread " + \
+                "sources across N workers sharing the cache and library")
+        parser.add_option("-a", "--batch-file", default=None,
+            dest="batch_file", help="queue the URLs or ids on the " + \
+                "given file, one per line, or on the standard input " + \
+                "with -, and process the queue")
+        parser.add_option("--priority", type="int", default=None,
+            dest="priority", help="priority of the sources queued " + \
+                "with --batch-file, higher ones are processed first")
+        parser.add_option("--drain", action="store_true", default=None,
+            dest="drain", help="process the sources queued by " + \
+                "--batch-file on other runs")
+        parser.add_option("--watch", action="store_true", default=None,
+            dest="watch", help="keep running and poll the sources " + \
+                "every `watch_interval` seconds")
+        parser.add_option("-l", "--loudness", action="store_true",
+            default=None, dest="loudness", help="write ReplayGain " + \
+                "tags measured while splitting files")
+        parser.add_option("--fingerprint", action="store_true",
+            default=None, dest="fingerprint", help="write Chromaprint " + \
+                "fingerprints and known MusicBrainz ids on the tracks " + \
+                "with fpcalc")
+        parser.add_option("-v", "--verbose", action="store_true",
+            dest="verbose", default=False, help="print processing " + \
+                "information")
+
+        ydl_cmd = ui.Subcommand('ydl', parser=parser,
+            help=u'Download music from YouTube')
+        ydl_cmd.func = ydl_func
+
+        return [ydl_cmd]
+
+    def get_youtubedl_options(self):
+        """Return `youtubedl_options`, set to the defaults on first use
+        unless configured
+        """
+        if self.config.get('youtubedl_options') is None:
+            self.config['youtubedl_options'] = {
+                'verbose': False,
+                'keepvideo': False,
+                'cachedir': self.cache_dir,
+                'outtmpl': self.outtmpl,
+                'restrictfilenames': True,
+                'ignoreerrors': True,
+                'nooverwrites': True,
+                'writethumbnail': True,
+                'quiet': True,
+                'usenetrc': os.path.exists(
+                    os.path.join(str(Path.home()), ".netrc")),
+                'format': 'bestaudio/best',
+                'postprocessors': [{
+                    'key': 'FFmpegExtractAudio',
+                    'preferredcodec': 'mp3',
+                    'preferredquality': '192',
+                    'nopostoverwrites': True
+                }]
+            }
+
+        options = self.config['youtubedl_options']
+        if self.config.get('passthrough'):
+            for postprocessor in options.get('postprocessors', []):
+                if postprocessor.get('key') == 'FFmpegExtractAudio':
+                    postprocessor['preferredcodec'] = 'best'
+
+        return options
+
+    def get_session(self):
+        """Return the youtube-dl session of the present run, shared by all
+        sources
+        """
+        if self.session is None:
+            youtubedl_config = self.get_youtubedl_options()
+            youtubedl_config['keepvideo'] = self.config.get('keep_files')
+            youtubedl_config['progress_hooks'] = [self.progress_hook]
+            if self.config.get('flat'):
+                youtubedl_config['extract_flat'] = 'in_playlist'
+            self.session = Session(youtubedl_config)
+
+        return self.session
+
+    def youtubedl(self, lib, opts, arg, cache=False):
+        """Calls YoutubeDL
+
+        Call beets when finishes downloading the audio file. We don't implement
+        a YoutubeDL's post processor because we want to call beets for every
+        download, and not after downloading a lot of files.
+
+        So we try to read `YoutubeDL.extract_info` entries and process them
+        with an internal `YoutubeDL.process_ie_result` method, that will
+        actually download the audio file.
+
+        With `cache`, the information extracted for `arg` is read from and
+        written to the info cache, see `read_info_cache`.
+
+        Returns `False` when no information could be fetched for `arg`.
+        """
+        if self.config.get('verbose'):
+            print("[ydl] Calling youtube-dl")
+
+        # playlist entries are extracted lazily through the same instance,
+        # so it's kept until all of them are read
+        with self.get_session().youtubedl() as y:
+            ie_result = None
+            if cache:
+                ie_result = self.read_info_cache(arg)
+
+            if ie_result is None:
+                with self.stats.stage('extract_info'):
+                    ie_result = y.extract_info(arg, download=False,
+                        process=False)
+                # single videos are resolved again by `resolve_entry` anyway
+                if cache and ie_result is not None and \
+                    'entries' in ie_result:
+                    ie_result = self.write_info_cache(arg, ie_result)
+
+            if ie_result is None:
+                print("[ydl] Error: Failed to fetch file information.")
+                print("[ydl]   If this is not a network problem, try " + \
+                    "upgrading")
+                print("[ydl]   beets-ydl:")
+                print("[ydl]")
+                print("[ydl]     pip install -U beets-ydl")
+                print("[ydl]")
+                return False
+
+            seen = []
+            if 'entries' in ie_result and self.config.get('incremental'):
+                entries = self.get_new_entries(self.get_incremental_key(arg),
+                    ie_result['entries'], seen)
+            elif 'entries' in ie_result:
+                entries = ie_result['entries']
+            else:
+                entries = [ie_result]
+
+            if self.shard is not None:
+                entries = (entry for entry in entries
+                    if in_shard(entry['id'], *self.shard))
+
+            download = self.config.get('download')
+            if self.config.get('force_download'):
+                download = True
+
+            jobs = int(self.config.get('jobs') or 1)
+            if jobs > 1 or self.config.get('pipeline'):
+                self.run_pipeline(lib, ie_result, entries, download, cache)
+            else:
+                for entry in entries:
+                    self.process_entry(lib, ie_result, entry, download, cache)
+
+            if len(seen) > 0 and download:
+                # batched imports are only in the library once flushed
+                self.flush_imports()
+                last = self.get_incremental_last(seen)
+                if last is not None:
+                    self.write_incremental_state(
+                        self.get_incremental_key(arg), last)
+
+        return True
+
+    def watch(self, lib, opts, urls):
+        """Poll `urls` until interrupted, each one on its own schedule
+
+        The library, the youtube-dl session and the ids already imported are
+        kept between polls, so every poll only costs the new entries. With
+        `stats`, they're written after every poll.
+        """
+        if len(urls) == 0:
+            raise ui.UserError('No sources to watch, pass them as ' + \
+                'arguments or set `urls`')
+
+        scheduler = Scheduler(urls, self.config.get('watch_interval'),
+            self.config.get('watch_jitter'),
+            self.config.get('watch_max_backoff'))
+        print("[ydl] Watching %d sources" % len(urls))
+
+        try:
+            while True:
+                url, wait = scheduler.due()
+                time.sleep(wait)
+
+                try:
+                    ok = self.youtubedl(lib, opts, url)
+                    self.flush_imports()
+                    self.evict_cache()
+                except Exception as e:
+                    print("[ydl] Error: Failed to poll %s: %s" % (url, e))
+                    ok = False
+
+                # stats are reported and started again on every poll, so
+                # they don't grow for as long as the process runs
+                if self.config.get('stats'):
+                    self.write_stats()
+                self.stats = Stats(self.config.get('verbose'))
+
+                delay = scheduler.done(url, ok)
+                if self.config.get('verbose'):
+                    print("[ydl] Polling %s again in %ds" % (url, delay))
+        except KeyboardInterrupt:
+            print("[ydl] Stopped watching")
+
+    def list_flat(self, lib, arg):
+        """Write one JSON line for every entry of `arg` without processing
+        them
+
+        Playlists are listed flat, and only entries not in the library are
+        resolved to read their descriptions, `jobs` at a time. Lines are
+        written in playlist order as soon as they are ready.
+        """
+        with self.get_session().youtubedl() as y:
+            with self.stats.stage('extract_info'):
+                ie_result = y.extract_info(arg, download=False,
+                    process=False)
+
+            if ie_result is None:
+                print("[ydl] Error: Failed to fetch file information.")
+                return False
+
+            entries = ie_result.get('entries') \
+                if 'entries' in ie_result else [ie_result]
+
+            jobs = int(self.config.get('jobs') or 1)
+            pending = collections.deque()
+            with ThreadPoolExecutor(max_workers=jobs) as pool:
+                for entry in entries:
+                    pending.append(pool.submit(self.get_flat_record, lib,
+                        entry))
+                    if len(pending) >= jobs * 2:
+                        self.write_flat_record(pending.popleft().result())
+                while len(pending) > 0:
+                    self.write_flat_record(pending.popleft().result())
+
+        return True
+
+    def get_flat_record(self, lib, entry):
+        """Return what is known about `entry` without downloading it
+
+        Entries not in the library are resolved and their tracklists parsed
+        from the description, without looking for chapters.
+        """
+        record = {
+            'id': entry.get('id'),
+            'title': entry.get('title'),
+            'url': entry.get('webpage_url') or entry.get('url'),
+            'in_library': self.is_in_library(entry, lib),
+        }
+        if record['in_library']:
+            return record
+
+        data = entry
+        if entry.get('_type') in ('url', 'url_transparent') or \
+            'description' not in entry:
+            try:
+                with self.stats.stage('resolve', entry.get('id')), \
+                    self.get_session().youtubedl() as y:
+                    data = y.process_ie_result(entry, download=False)
+            except Exception as e:
+                data = None
+                record['error'] = str(e)
+            if not data:
+                record.setdefault('error', 'no information')
+                return record
+
+        title, fullalbum = tracklist.strip_fullalbum(data.get('title') or '')
+        year, title = tracklist.get_year(title)
+        artist, album = tracklist.parse_title(title)
+        tracks = tracklist.parse_tracklist(data.get('description'),
+            data.get('duration'))[0]
+
+        record.update({
+            'title': data.get('title'),
+            'url': data.get('webpage_url') or record['url'],
+            'duration': data.get('duration'),
+            'artist': artist,
+            'album': album,
+            'year': year,
+            'is_album': fullalbum or len(tracks) > 1,
+            'tracks': tracks,
+        })
+        return record
+
+    def write_flat_record(self, record):
+        sys.stdout.write(json.dumps(record, sort_keys=True) + '\n')
+        sys.stdout.flush()
+
+    def run_queue(self, lib, opts):
+        """Add the sources on `batch_file` to the work queue, and process
+        the queue until it's empty
+
+        Several runs can process the same queue at the same time, each
+        source is claimed by one of them.
+        """
+        work = WorkQueue(self.queue_file)
+        try:
+            if self.config.get('batch_file'):
+                with self.stats.stage('queue'):
+                    added = work.add_all(
+                        self.read_batch_file(self.config.get('batch_file')),
+                        int(self.config.get('priority') or 0),
+                        self.get_url_id, self.library_ids.__contains__)
+                print("[ydl] Queued %d new sources" % added)
+
+            worker = '%s %d' % (socket.gethostname(), os.getpid())
+            while True:
+                url = work.claim(worker, float(self.config.get('lock_ttl')))
+                if url is None:
+                    break
+
+                try:
+                    if self.youtubedl(lib, opts, url):
+                        self.flush_imports()
+                        work.done(url)
+                    else:
+                        work.fail(url, 'no information')
+                except Exception as e:
+                    print("[ydl] Error: Failed to process %s: %s" % (url, e))
+                    work.fail(url, e)
+
+            print("[ydl] Queue: " + ', '.join('%d %s' % (count, state)
+                for state, count in sorted(work.counts().items())))
+        finally:
+            work.close()
+
+    def read_batch_file(self, path):
+        """Yield the URLs or ids on `path`, or on the standard input with
+        `-`, skipping blank lines and `#` comments
+        """
+        f = sys.stdin if path == '-' else open(path)
+        try:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith('#'):
+                    yield line.split()[0]
+        finally:
+            if f is not sys.stdin:
+                f.close()
+
+    def get_url_id(self, url):
+        """Return the entry id of `url` without network access, or `None`
+
+        The extractor that last matched is tried first, since listed URLs
+        usually come from the same site.
+        """
+        if self.extractors is None:
+            from youtube_dl.extractor import gen_extractor_classes
+            self.extractors = [ie for ie in gen_extractor_classes()
+                if ie.ie_key() != 'Generic']
+
+        for index, ie in enumerate(self.extractors):
+            if not ie.suitable(url):
+                continue
+            if index > 0:
+                self.extractors.insert(0, self.extractors.pop(index))
+            try:
+                return ie._match_id(url)
+            except (AttributeError, AssertionError, IndexError, TypeError):
+                return None
+
+        return None
+
+    def get_new_entries(self, key, entries, seen):
+        """Yield playlist `entries` until reaching the newest entry processed
+        on the last incremental run of `key`
+
+        `entries` is consumed lazily, so the extractor only resolves the new
+        head of the playlist. Yielded ids are appended to `seen`.
+        """
+        last = self.read_incremental_state().get(key)
+        for entry in entries:
+            if last is not None and entry['id'] == last:
+                if self.config.get('verbose'):
+                    print("[ydl] Reached last processed entry: " + last)
+                return
+            seen.append(entry['id'])
+            yield entry
+
+    def get_incremental_key(self, url):
+        """Return the key of `url` on the incremental state, which is kept
+        apart for every shard
+        """
+        if self.shard is None:
+            return url
+        return '%s %d/%d' % ((url,) + self.shard)
+
+    def get_incremental_last(self, seen):
+        """Return the newest of the `seen` entries such that it and every
+        older one of this shard are in the library, or `None`
+
+        Entries that failed, or were locked by another worker, are tried
+        again on the next run.
+        """
+        done = self.library_ids or ()
+        last = None
+        for entry_id in reversed(seen):
+            if entry_id not in done and (self.shard is None or \
+                in_shard(entry_id, *self.shard)):
+                break
+            last = entry_id
+        return last
+
+    def read_incremental_state(self):
+        try:
+            with open(self.incremental_file) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def write_incremental_state(self, key, entry_id):
+        """Record `entry_id` as the newest processed entry of `key`
+
+        The state is shared by every worker on the cache, so it's read and
+        written again under a lock.
+        """
+        if not os.path.exists(self.cache_dir):
+            os.makedirs(self.cache_dir)
+
+        with FileLock(self.incremental_file + '.lock',
+            float(self.config.get('lock_ttl'))):
+            state = self.read_incremental_state()
+            state[key] = entry_id
+
+            tmp = '%s.%s' % (self.incremental_file, uuid.uuid4().hex)
+            with open(tmp, 'w') as f:
+                json.dump(state, f)
+            os.replace(tmp, self.incremental_file)
+
+    def run_pipeline(self, lib, ie_result, entries, download, cache=False):
+        """Process `entries` in overlapping stages: resolve, download,
+        split and import
+
+        Each stage has its own concurrency, so the network, the CPU and the
+        library are kept busy at the same time.
+        """
+        jobs = int(self.config.get('jobs') or 1)
+        pipeline = Pipeline(int(self.config.get('queue_size') or 1),
+            self.config.get('verbose'))
+
+        if self.config.get('verbose'):
+            print("[ydl] Processing entries in a pipeline with %d jobs" % \
+                jobs)
+
+        def journaled(func):
+            def stage(item):
+                try:
+                    return func(item)
+                except Exception as e:
+                    entry_id = item['id'] if isinstance(item, dict) \
+                        else item.info.get('id')
+                    self.fail_entry(entry_id, e)
+                    raise
+            return stage
+
+        def resolve(entry):
+            return self.resolve_entry(lib, ie_result, entry, download, cache,
+                defer=True)
+
+        def download_item(item):
+            if download and not journal.reached(item.stage, 'downloaded'):
+                item.download()
+            return item
+
+        def split(item):
+            item.prepare_item()
+            return item
+
+        def import_item(item):
+            item.import_item()
+
+        pipeline.add_stage('resolve', journaled(resolve),
+            self.config.get('resolve_jobs') or 1)
+        pipeline.add_stage('download', journaled(download_item), jobs)
+        pipeline.add_stage('split', journaled(split),
+            self.config.get('split_jobs') or 1)
+        pipeline.add_stage('import', journaled(import_item), 1)
+        pipeline.run(entries)
+
+    def process_entry(self, lib, ie_result, entry, download, cache=False):
+        """Download and process a single playlist entry
+
+        Failures are reported and swallowed so the remaining entries still
+        get processed.
+        """
+        try:
+            item = self.resolve_entry(lib, ie_result, entry, download, cache)
+            if item is not None:
+                item.process_item()
+        except Exception as e:
+            print("[ydl] Error: Failed to process %s: %s" % (entry['id'], e))
+            self.fail_entry(entry['id'], e)
+
+    def resolve_entry(self, lib, ie_result, entry, download, cache=False,
+        defer=False):
+        """Resolve a playlist entry, and download it with `download`
+
+        With `defer` the entry is only resolved, and downloading it is left
+        to the caller. Returns a fork of the plugin holding the entry
+        information, or `None` when the entry is skipped.
+        """
+        if self.is_in_library(entry, lib) and \
+            not self.config.get('force_download'):
+            if self.config.get('verbose'):
+                print('[ydl] Skipping item already in library:' + \
+                    ' %s [%s]' % (entry.get('title'), entry['id']))
+            return None
+
+        if not self.lock_entry(entry['id']):
+            if self.config.get('verbose'):
+                print('[ydl] Skipping item locked by another worker:' + \
+                    ' %s [%s]' % (entry.get('title'), entry['id']))
+            return None
+
+        if self.config.get('verbose') and not download:
+            print("[ydl] Skipping download: " + entry['id'])
+
+        state = None
+        if self.config.get('resume') and self.journal is not None:
+            state = self.journal.get(entry['id'])
+        if state is not None and (state['info'] is None or \
+            state['stage'] == 'imported'):
+            state = None
+        if state is not None:
+            state['stage'] = self.fork(dict(ie_result, **state['info'])) \
+                .get_resume_stage(state['stage'], state['tracks'])
+            if state['stage'] is None:
+                state = None
+
+        data = None
+        if state is not None:
+            if self.config.get('verbose'):
+                print("[ydl] Resuming %s after stage %s" % (entry['id'],
+                    state['stage']))
+            data = state['info']
+        elif cache and not download:
+            data = self.read_info_cache(entry['id'])
+
+        # with `stream_split` the entry is resolved first, so `download` can
+        # tell if it can be split while downloading
+        fetch = download and not defer and \
+            not self.config.get('stream_split')
+
+        if data is None:
+            with self.stats.stage('download' if fetch else 'resolve',
+                entry['id']), self.get_session().youtubedl() as y:
+                data = y.process_ie_result(entry, download=fetch)
+            if cache and not download and data:
+                data = self.write_info_cache(entry['id'], data)
+
+        if not data:
+            print("[ydl] No data for " + entry['id'])
+            self.unlock_entry(entry['id'])
+            return None
+
+        info = dict(ie_result)
+        info.update(data)
+        item = self.fork(info)
+        item.entry_info = data
+
+        if state is not None:
+            item.stage = state['stage']
+            item.journal_tracks = state['tracks']
+            if download and not defer and item.stage == 'resolved':
+                item.download()
+        else:
+            item.set_stage('downloaded' if fetch else 'resolved',
+                info=data)
+            if download and not fetch and not defer:
+                item.download()
+
+        return item
+
+    def get_resume_stage(self, stage, tracks):
+        """Return the journal `stage` the present entry can be resumed
+        from, going back to an earlier one when its files are gone
+
+        Entries only resolved, or without their downloaded file, return
+        `None` and are resolved again, since stream URLs on the resolved
+        information expire.
+        """
+        audio_file = self.find_audio_file()
+        downloaded = os.path.exists(audio_file)
+
+        if stage == 'split' and tracks is not None:
+            if not tracks['album']:
+                return stage if downloaded else None
+            outdir = os.path.dirname(audio_file)
+            names = os.listdir(outdir) if os.path.isdir(outdir) else []
+            prefixes = ['%03d-%s' % (track.get('track', 0),
+                self.info.get('id')) for track in tracks['tracks']]
+            if all(any(name.startswith(prefix) for name in names)
+                for prefix in prefixes):
+                return stage
+
+        if journal.reached(stage, 'downloaded') and downloaded:
+            return 'downloaded'
+
+        return None
+
+    def download(self):
+        """Download the entry resolved by `resolve_entry`
+
+        When it can be split while downloading, nothing is downloaded here
+        and `split_file` reads the stream instead.
+        """
+        self.streaming = self.can_stream()
+        if self.streaming:
+            if self.config.get('verbose'):
+                print("[ydl] Splitting %s while downloading" % \
+                    self.info.get('id'))
+            return
+
+        self.download_file()
+
+    def download_file(self):
+        with self.stats.stage('download', self.info.get('id')), \
+            self.get_session().youtubedl() as y:
+            y.process_info(self.entry_info)
+
+        self.set_stage('downloaded')
+
+    def can_stream(self):
+        """Check if the entry can be split straight from its stream URL
+
+        It needs a single http stream and a tracklist on the description.
+        Chapters youtube-dl found are made from that same tracklist, and are
+        not embedded in the downloaded file either.
+        """
+        if not self.config.get('stream_split') or \
+            not self.config.get('split_files') or \
+            self.config.get('write_dummy_mp3'):
+            return False
+
+        info = getattr(self, 'entry_info', None) or {}
+        if info.get('protocol') not in ('http', 'https') or \
+            not info.get('url') or info.get('requested_formats') or \
+            self.get_stream_codec() is None:
+            return False
+
+        tracks = tracklist.parse_tracklist(info.get('description') or '',
+            info.get('duration'))[0]
+        return len(tracks) > 1
+
+    def get_stream_codec(self):
+        """Return the extension and ffmpeg codec options of tracks split
+        from the stream, or `None` when they can't be written
+        """
+        codec = None
+        quality = None
+        for postprocessor in self.get_youtubedl_options().get(
+            'postprocessors', []):
+            if postprocessor.get('key') == 'FFmpegExtractAudio':
+                codec = postprocessor.get('preferredcodec', 'best')
+                quality = postprocessor.get('preferredquality')
+
+        if codec is None or codec == 'best':
+            # same containers youtube-dl extracts these codecs to
+            acodec = (self.entry_info.get('acodec') or '').split('.')[0]
+            ext = {'opus': 'opus', 'vorbis': 'ogg', 'mp4a': 'm4a',
+                'mp3': 'mp3', 'flac': 'flac'}.get(acodec)
+            return None if ext is None else ('.' + ext,
+                ['-vn', '-acodec', 'copy'])
+
+        encoder = {'mp3': 'libmp3lame', 'm4a': 'aac', 'aac': 'aac',
+            'opus': 'libopus', 'vorbis': 'libvorbis',
+            'flac': 'flac'}.get(codec)
+        if encoder is None:
+            return None
+
+        opts = ['-vn', '-acodec', encoder]
+        if quality and encoder != 'flac':
+            # youtube-dl reads qualities under 10 as VBR levels
+            quality = str(quality).rstrip('kK')
+            opts.extend(['-q:a', quality] if float(quality) < 10 else
+                ['-b:a', quality + 'k'])
+        ext = 'ogg' if codec == 'vorbis' else codec
+        return '.' + ext, opts
+
+    def get_stream_input_options(self):
+        """Return the ffmpeg input options to read the stream URL with the
+        HTTP headers youtube-dl would use
+        """
+        opts = ['-reconnect', '1', '-reconnect_streamed', '1']
+        headers = self.entry_info.get('http_headers') or {}
+        if len(headers) > 0:
+            opts.extend(['-headers', ''.join('%s: %s\r\n' % (k, v)
+                for k, v in headers.items())])
+        return opts + ['-i', self.entry_info['url']]
+
+    def set_stage(self, stage, **kwargs):
+        """Record on the journal that the present entry completed `stage`
+        """
+        self.stage = stage
+        if self.journal is not None:
+            self.journal.set(self.info.get('id'), stage, **kwargs)
+
+        lock = self.entry_locks.get(self.info.get('id'))
+        if lock is not None:
+            lock.refresh()
+
+    def fail_entry(self, entry_id, error):
+        if self.journal is not None and entry_id is not None:
+            self.journal.fail(entry_id, error)
+        self.unlock_entry(entry_id)
+
+    def uses_locks(self):
+        return self.shard is not None or self.config.get('cache_locks')
+
+    def lock_entry(self, entry_id):
+        """Take the cache lock of `entry_id`, so no other worker processes
+        it at the same time
+
+        Returns `False` when another worker holds it. Locks are only taken
+        with `shard` or `cache_locks`.
+        """
+        if not self.uses_locks():
+            return True
+
+        if not os.path.exists(self.entry_lock_dir):
+            os.makedirs(self.entry_lock_dir, exist_ok=True)
+
+        lock = FileLock(self.get_entry_lock_path(entry_id),
+            float(self.config.get('lock_ttl')))
+        if not lock.acquire():
+            return False
+
+        self.entry_locks[entry_id] = lock
+        return True
+
+    def unlock_entry(self, entry_id):
+        lock = self.entry_locks.pop(entry_id, None)
+        if lock is not None:
+            lock.release()
+
+    def get_entry_lock_path(self, entry_id):
+        return '%s/%s.lock' % (self.entry_lock_dir, entry_id)
+
+    def is_entry_locked(self, entry_id):
+        """Check if a worker other than this one holds `entry_id`
+        """
+        if entry_id in self.entry_locks:
+            return False
+
+        path = self.get_entry_lock_path(entry_id)
+        return os.path.exists(path) and \
+            not FileLock(path, float(self.config.get('lock_ttl'))).is_stale()
+
+    @contextmanager
+    def import_lease(self):
+        """Hold the library import lock while importing, when workers
+        share the library
+        """
+        if not self.uses_locks():
+            yield
+            return
+
+        lease = FileLock(os.fsdecode(self.lib.path) + '.ydl-lock',
+            float(self.config.get('lock_ttl')))
+        if not lease.acquire():
+            if self.config.get('verbose'):
+                print("[ydl] Waiting for another worker to import")
+            lease.acquire(block=True)
+
+        try:
+            yield
+        finally:
+            lease.release()
+
+    def progress_hook(self, status):
+        """Count downloaded bytes from youtube-dl progress reports
+        """
+        if status.get('status') != 'finished':
+            return
+
+        size = status.get('total_bytes') or status.get('downloaded_bytes') or 0
+        entry = os.path.basename(os.path.dirname(status.get('filename', '')))
+        self.stats.add('downloaded_bytes', size, entry or None)
+
+    def run_command(self, cmd, **kwargs):
+        """Run `cmd` with `subprocess.run`, timing it on the present entry
+        """
+        info = getattr(self, 'info', None) or {}
+        # the output of commands follows everything else, see `ydl_func`
+        if sys.stdout is sys.stderr:
+            kwargs.setdefault('stdout', sys.stderr)
+        with self.stats.stage(os.path.basename(cmd[0]), info.get('id')):
+            return subprocess.run(cmd, **kwargs)
+
+    def write_stats(self):
+        """Write the run stats to `stats_file`, or to the standard output
+        """
+        if self.config.get('stats_file'):
+            with open(self.config.get('stats_file'), 'w') as out:
+                self.stats.write(out)
+        else:
+            self.stats.write(self.stdout)
+
+    def get_info_cache_path(self, key):
+        return '%s/%s.json' % (self.info_cache_dir,
+            md5(key.encode()).hexdigest())
+
+    def read_info_cache(self, key):
+        """Return the cached information for `key`, an URL or an entry id,
+        or `None` when it's not cached or older than `info_cache_ttl`
+        seconds
+        """
+        ttl = float(self.config.get('info_cache_ttl') or 0)
+        if ttl <= 0 or self.config.get('refresh'):
+            return None
+
+        path = self.get_info_cache_path(key)
+        try:
+            if time.time() - os.path.getmtime(path) > ttl:
+                return None
+            with open(path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if self.config.get('verbose'):
+            print("[ydl] Using cached information for " + key)
+
+        return data
+
+    def write_info_cache(self, key, data):
+        """Write `data` to the info cache when `info_cache_ttl` is set
+
+        Stream URLs expire long before the information does, so they are
+        left out. Playlists are written once all their entries were read,
+        with only what's needed to resolve them again, so entries are still
+        read lazily and a playlist that wasn't read to the end, like on
+        `incremental` runs, isn't written. The data that should be used from
+        then on is returned.
+        """
+        if float(self.config.get('info_cache_ttl') or 0) <= 0:
+            return data
+
+        if 'entries' in data:
+            data['entries'] = self.cache_entries(key, data, data['entries'])
+        else:
+            self.dump_info_cache(key, self.strip_stream_info(data))
+
+        return data
+
+    def cache_entries(self, key, data, entries):
+        """Yield `entries`, and write `data` to the info cache with every
+        entry as an URL to resolve once they were all read
+        """
+        listing = []
+        for entry in entries:
+            listing.append({
+                '_type': 'url',
+                'url': entry.get('webpage_url') or entry.get('url'),
+                'ie_key': entry.get('ie_key') or entry.get('extractor_key'),
+                'id': entry.get('id'),
+                'title': entry.get('title'),
+            })
+            yield entry
+
+        self.dump_info_cache(key,
+            dict(self.strip_stream_info(data), entries=listing))
+
+    def strip_stream_info(self, data):
+        """Return `data` without the formats and stream URLs resolved for
+        downloading it
+        """
+        stream_keys = ('formats', 'requested_formats', 'url', 'manifest_url',
+            'fragments', 'http_headers', 'protocol')
+        return dict((k, v) for k, v in data.items() if k not in stream_keys)
+
+    def dump_info_cache(self, key, data):
+        if not os.path.exists(self.info_cache_dir):
+            os.makedirs(self.info_cache_dir)
+
+        path = self.get_info_cache_path(key)
+        tmp = '%s.%s' % (path, uuid.uuid4().hex)
+        with open(tmp, 'w') as f:
+            json.dump(data, f, default=str)
+        os.replace(tmp, path)
+
+    def fork(self, info):
+        """Return a shallow copy of the plugin to hold the state of a
+        single entry (`info`, `tracks`, `audio_file`...)
+        """
+        item = copy.copy(self)
+        item.info = info
+        return item
+
+    def load_library_ids(self, lib):
+        """Read every `ydl` id set on library items and albums
+
+        This is done once per run, so checking entries against the library
+        doesn't cost two queries per entry.
+        """
+        ids = set()
+        with lib.transaction() as tx:
+            for table in ('item_attributes', 'album_attributes'):
+                rows = tx.query("SELECT value FROM %s WHERE key = 'ydl'" % \
+                    table)
+                ids.update(row[0] for row in rows)
+
+        return ids
+
+    def is_in_library(self, entry, lib):
+        """Check if an `entry` is already in the `lib` beets library
+        """
+        if self.library_ids is None:
+            self.library_ids = self.load_library_ids(lib)
+
+        return entry['id'] in self.library_ids
+
+    def get_file_path(self, ext):
+        return self.outtmpl % { 'id': self.info.get('id'), 'ext': ext }
+
+    def find_audio_file(self):
+        """Return the path of the downloaded audio file, whatever its
+        extension is
+
+        The postprocessor codec is preferred, then audio files over video
+        containers kept with `keep_files`. When nothing was downloaded, it is
+        where the file would be according to the extractor or the
+        postprocessor codec.
+        """
+        codec = None
+        for postprocessor in self.get_youtubedl_options().get(
+            'postprocessors', []):
+            if postprocessor.get('key') == 'FFmpegExtractAudio' and \
+                postprocessor.get('preferredcodec', 'best') != 'best':
+                codec = postprocessor['preferredcodec']
+
+        audio_file = self.get_file_path(codec or self.info.get('ext') or 'mp3')
+        if codec is not None and os.path.exists(audio_file):
+            return audio_file
+
+        outdir = os.path.dirname(audio_file)
+        prefix = self.info.get('id') + '.'
+        ignored = ('.part', '.ytdl', '.json', '.jpg', '.jpeg', '.png',
+            '.webp', '.wav')
+        videos = ('.webm', '.mp4', '.mkv', '.flv')
+
+        if os.path.isdir(outdir):
+            names = [name for name in os.listdir(outdir)
+                if name.startswith(prefix) and not name.endswith(ignored)]
+            names.sort(key=lambda name: (name.endswith(videos), name))
+            if len(names) > 0:
+                return os.path.join(outdir, names[0])
+
+        return audio_file
+
+    def is_album(self):
+        return self.fullalbum_stripped or len(self.tracks) > 1
+
+    def process_item(self):
+        """Called after downloading source with YoutubeDL
+
+        From here on, the plugin assumes its state according to what
+        is being downloaded.
+        """
+        self.prepare_item()
+        self.import_item()
+
+    def prepare_item(self):
+        """Find tracks on the downloaded item and split it into files
+        """
+        print('[ydl] Processing item: ' + self.info.get('title'))
+
+        self.audio_file = self.find_audio_file()
+        self.outdir, self.audio_file_ext = os.path.splitext(self.audio_file)
+        self.outdir = os.path.dirname(self.outdir)
+
+        self.touch_cache_entry()
+
+        tracks = getattr(self, 'journal_tracks', None)
+        if self.stage == 'split' and tracks is not None:
+            if self.config.get('verbose'):
+                print('[ydl] Using tracks found on a previous run')
+            self.tracks = tracks['tracks']
+            self.fullalbum_stripped = tracks['album']
+            return
+
+        if self.config.get('verbose') and \
+            self.config.get('download') and \
+            not self.streaming and \
+            not os.path.exists(self.audio_file):
+            raise ui.UserError('Audio file not found: ' + self.audio_file)
+
+        self.strip_fullalbum()
+        with self.stats.stage('extract_tracks', self.info.get('id')):
+            self.extract_tracks()
+
+        if not self.is_album() or len(self.tracks) == 0:
+            self.set_single_file_data()
+
+        if self.config.get('verbose'):
+            print(self.get_tracklist())
+
+        if self.config.get('write_dummy_mp3'):
+            self.write_dummy_mp3()
+
+        if self.config.get('verbose') and self.is_album():
+            print("[ydl] URL is identified as an album")
+        else:
+            print("[ydl] URL is identified as a singleton")
+
+        if self.config.get('split_files') \
+            and not self.config.get('write_dummy_mp3') \
+            and self.is_album():
+            with self.stats.stage('split', self.info.get('id')):
+                self.split_file()
+
+        if self.config.get('fingerprint') \
+            and not self.config.get('write_dummy_mp3'):
+            with self.stats.stage('fingerprint', self.info.get('id')):
+                self.fingerprint_tracks()
+
+        if journal.reached(self.stage, 'downloaded'):
+            self.set_stage('split', tracks={
+                'tracks': self.tracks,
+                'album': self.is_album()
+            })
+
+    def import_item(self):
+        """Import the prepared item into beets and clean up afterwards
+        """
+        if self.config.get('import') and self.config.get('batch_import'):
+            self.queue_import()
+            return
+        elif self.config.get('import'):
+            beet_cmd = self.get_beet_cmd()
+            if self.config.get('verbose'):
+                print("[ydl] Running beets: " + ' '.join(beet_cmd))
+            # concurrent imports would fight for the library and the prompt
+            with self.import_lock, self.import_lease(), \
+                self.stats.stage('import', self.info.get('id')):
+                result = self.run_command(beet_cmd)
+            if result.returncode == 0:
+                self.library_ids.add(self.info.get('id'))
+                self.set_stage('imported')
+        elif self.config.get('verbose'):
+            print('[ydl] Skipping import')
+
+        if not self.config.get('keep_files'):
+            self.clean()
+        elif self.config.get('verbose') and self.config.get('keep_files'):
+            print('[ydl] Keeping downloaded files on ' + self.outdir)
+
+        self.unlock_entry(self.info.get('id'))
+
+    def get_beet_cmd(self):
+        beet_cmd = ['beet']
+
+        if os.getenv('BEETS_ENV') == 'develop':
+            beet_cmd.extend(['-c', 'env.config.yml'])
+
+        if self.config.get('verbose'):
+            beet_cmd.extend(['-v'])
+
+        beet_cmd.extend(['import', '--set', 'ydl=' + self.info.get('id')])
+
+        if not self.is_album():
+            beet_cmd.extend(['--singletons'])
+
+        beet_cmd.extend([self.get_import_path()])
+
+        return beet_cmd
+
+    def get_import_path(self):
+        if os.path.exists(self.outdir):
+            return self.outdir
+        return self.audio_file
+
+    def queue_import(self):
+        """Queue the processed item to be imported by `flush_imports`
+
+        The queue is flushed when it reaches `import_batch_size` items, or
+        at the end of the run.
+        """
+        if self.config.get('verbose'):
+            print('[ydl] Queueing import: ' + self.get_import_path())
+
+        with self.import_lock:
+            self.import_queue.append(self)
+            size = len(self.import_queue)
+
+        batch_size = int(self.config.get('import_batch_size') or 0)
+        if batch_size > 0 and size >= batch_size:
+            self.flush_imports()
+
+    def flush_imports(self):
+        """Import every queued item with beets' importer inside the running
+        process, using the already opened library
+
+        Albums and singletons are imported in separate sessions, and the
+        `ydl` field of each imported item is set by `import_task_files`.
+        """
+        with self.import_lock:
+            queue = self.import_queue[:]
+            del self.import_queue[:]
+
+            if len(queue) == 0:
+                return
+
+            try:
+                from beets.ui.commands import import_files
+            except ImportError:
+                from beets.ui.commands.import_ import import_files
+
+            singletons = config['import']['singletons'].get()
+            for album in (True, False):
+                batch = [item for item in queue if item.is_album() == album]
+                if len(batch) == 0:
+                    continue
+
+                paths = []
+                for item in batch:
+                    path = util.normpath(item.get_import_path())
+                    self.import_ids[path] = item.info.get('id')
+                    paths.append(path)
+
+                if self.config.get('verbose'):
+                    print('[ydl] Importing %d %s' % (len(paths),
+                        'albums' if album else 'singletons'))
+
+                config['import']['singletons'] = not album
+                try:
+                    with self.import_lease(), self.stats.stage('import'):
+                        import_files(self.lib, paths, None)
+                finally:
+                    config['import']['singletons'] = singletons
+                    for path in paths:
+                        self.import_ids.pop(path, None)
+
+        for item in queue:
+            if not item.config.get('keep_files'):
+                item.clean()
+            item.unlock_entry(item.info.get('id'))
+
+    def import_task_files(self, session, task):
+        """Set the `ydl` field on items imported by `flush_imports`
+
+        The MusicBrainz ids of fingerprinted tracks imported from the cache
+        are also recorded, by `flush_imports` or by `beet import`.
+        """
+        if task.toppath is not None and task.toppath.startswith(
+            util.normpath(self.cache_dir)):
+            self.record_mbids(task)
+
+        ydl_id = self.import_ids.get(task.toppath)
+        if ydl_id is None:
+            return
+
+        self.library_ids.add(ydl_id)
+        if self.journal is not None:
+            self.journal.set(ydl_id, 'imported')
+
+        if task.is_album:
+            task.album['ydl'] = ydl_id
+            task.album.store()
+
+        for item in task.imported_items():
+            item['ydl'] = ydl_id
+            item.store()
+
+    def get_fingerprint_cache(self):
+        if self.fingerprints is None:
+            self.fingerprints = fingerprint.FingerprintCache(
+                self.fingerprint_file)
+        return self.fingerprints
+
+    def get_track_files(self):
+        """Return the `(track, path)` of every file to be imported
+        """
+        if not self.is_album():
+            return [(self.tracks[0], self.audio_file)] if \
+                len(self.tracks) > 0 and os.path.exists(self.audio_file) \
+                else []
+
+        if not self.config.get('split_files'):
+            return []
+
+        return [(track, opts[-1]) for track, opts in
+            zip(self.tracks, self.get_split_outputs())
+            if os.path.exists(opts[-1])]
+
+    def fingerprint_tracks(self):
+        """Fingerprint the tracks to be imported with `fpcalc`, in parallel,
+        and tag them with the MusicBrainz ids they were imported with before
+
+        Fingerprints of tracks already seen on previous runs are read from
+        the cache instead.
+        """
+        files = self.get_track_files()
+        if len(files) == 0:
+            return
+
+        if shutil.which('fpcalc') is None:
+            print("[ydl] Error: fpcalc is needed to fingerprint tracks")
+            return
+
+        if self.config.get('verbose'):
+            print("[ydl] Fingerprinting %d tracks" % len(files))
+
+        with ThreadPoolExecutor(max_workers=os.cpu_count() or 1) as pool:
+            prints = list(pool.map(self.fingerprint_track, files))
+
+        cache = self.get_fingerprint_cache()
+        mbids = [cache.get_mbids(p) if p else None for p in prints]
+        # the album is only known when all of its tracks agree on it
+        albums = set(ids[1] if ids else None for ids in mbids)
+        album = albums.pop() if len(albums) == 1 else None
+
+        for (track, path), fp, ids in zip(files, prints, mbids):
+            if fp is not None:
+                fingerprint.write_tags(path, fp, ids[0] if ids else None,
+                    album)
+
+    def fingerprint_track(self, track_file):
+        """Return the fingerprint of a `(track, path)`, or `None`
+        """
+        track, path = track_file
+        key = '%s:%s:%s:%s' % (self.info.get('id'), track.get('track'),
+            track.get('start'), track.get('end'))
+
+        cache = self.get_fingerprint_cache()
+        cached = cache.get_track(key)
+        if cached is not None:
+            return cached[1]
+
+        result = self.run_command(fingerprint.get_fpcalc_command(path),
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        if result.returncode != 0:
+            return None
+
+        duration, fp = fingerprint.parse_fpcalc(result.stdout)
+        cache.set_track(key, duration, fp)
+        return fp
+
+    def record_mbids(self, task):
+        """Record the MusicBrainz ids fingerprinted tracks of `task` were
+        imported with
+        """
+        for item in task.imported_items():
+            fp = item.get('acoustid_fingerprint')
+            if fp and item.get('mb_trackid'):
+                self.get_fingerprint_cache().set_mbids(fp,
+                    item.get('mb_trackid'), item.get('mb_albumid'))
+
+    def clean(self):
+        """Deletes everything related to the present run.
+
+        Files of entries locked by another worker are left alone.
+        """
+        if self.is_entry_locked(self.info.get('id')):
+            return
+
+        if os.path.isdir(self.outdir):
+            shutil.rmtree(self.outdir)
+        elif os.path.exists(self.audio_file):
+            os.remove(self.audio_file)
+
+    def touch_cache_entry(self):
+        """Mark the cache directory of the present run as recently used
+        """
+        if os.path.isdir(self.outdir):
+            os.utime(self.outdir)
+
+    def get_cache_entries(self):
+        """Return `(path, size, last_used)` for every downloaded entry on cache
+
+        Entries are the directories named after an id that hold the files of
+        that id, so metadata caches and youtube-dl's own cache are left out.
+        """
+        entries = []
+        if not os.path.isdir(self.cache_dir):
+            return entries
+
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if name.startswith('.') or not os.path.isdir(path):
+                continue
+
+            size = 0
+            is_entry = False
+            for root, dirs, files in os.walk(path):
+                for f in files:
+                    is_entry = is_entry or name in f
+                    try:
+                        size += os.path.getsize(os.path.join(root, f))
+                    except OSError:
+                        pass
+
+            if is_entry:
+                entries.append((path, size, os.path.getmtime(path)))
+
+        return entries
+
+    def parse_size(self, size):
+        """Convert sizes like `500M` or `10G` to bytes
+        """
+        units = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3, 'T': 1024 ** 4}
+        size = str(size).strip().upper().rstrip('B')
+        if size and size[-1] in units:
+            return int(float(size[:-1]) * units[size[-1]])
+
+        return int(float(size or 0))
+
+    def format_size(self, size):
+        for unit in ('B', 'K', 'M', 'G'):
+            if size < 1024:
+                return '%.1f%s' % (size, unit)
+            size /= 1024.0
+
+        return '%.1fT' % size
+
+    def evict_cache(self):
+        """Remove the least recently used entries on cache until it fits in
+        `cache_size` bytes
+        """
+        budget = self.parse_size(self.config.get('cache_size') or 0)
+        entries = sorted(self.get_cache_entries(), key=lambda e: e[2])
+        total = sum(entry[1] for entry in entries)
+
+        for path, size, last_used in entries:
+            if budget <= 0 or total <= budget:
+                break
+            if self.is_entry_locked(os.path.basename(path)):
+                continue
+            if self.config.get('verbose'):
+                print('[ydl] Evicting from cache: ' + path)
+            shutil.rmtree(path)
+            total -= size
+
+        if self.config.get('verbose') and total > 0:
+            print('[ydl] %s in cache' % self.format_size(total))
+
+    def print_cache_stats(self):
+        entries = sorted(self.get_cache_entries(), key=lambda e: e[2],
+            reverse=True)
+        total = sum(entry[1] for entry in entries)
+        budget = self.parse_size(self.config.get('cache_size') or 0)
+
+        print('[ydl] Cache directory: ' + self.cache_dir)
+        print('[ydl] %d entries, %s used, %s budget' % (len(entries),
+            self.format_size(total),
+            self.format_size(budget) if budget > 0 else 'no'))
+        for path, size, last_used in entries:
+            print('[ydl]   %s  %8s  %s' % (
+                time.strftime('%Y-%m-%d %H:%M', time.localtime(last_used)),
+                self.format_size(size), os.path.basename(path)))
+
+    def strip_fullalbum(self):
+        """Will remove '[Full Album]' entries on video title.
+        """
+        self.info['title'], self.fullalbum_stripped = \
+            tracklist.strip_fullalbum(self.info.get('title'))
+
+    def split_file(self):
+        """Split downloaded file into multiple tracks
+
+        Tries to parse metadata from the video description. All tracks are
+        cut in a single ffmpeg run with one output per track, so the album
+        file is only read once. If that fails, one ffmpeg process per track
+        is run in parallel, and the album file is kept if any of them fails.
+
+        When `download` left the entry to be split while downloading, the
+        stream URL is read instead, and the file is only downloaded if that
+        fails.
+        """
+        # @TODO check for overwrites according to options
+
+        if self.config.get('verbose'):
+            print("[ydl] Splitting tracks")
+
+        if not os.path.exists(self.outdir):
+            os.makedirs(self.outdir)
+
+        if self.streaming:
+            if self.split_stream():
+                return
+            if self.config.get('verbose'):
+                print("[ydl] Splitting while downloading failed, " + \
+                    "downloading the whole file")
+            self.streaming = False
+            self.download_file()
+            self.audio_file = self.find_audio_file()
+            self.audio_file_ext = os.path.splitext(self.audio_file)[1]
+
+        outputs = self.get_split_outputs()
+
+        if len(outputs) > 0 and os.path.exists(self.audio_file):
+            print("[ydl] Running ffmpeg")
+            ffmpeg_cmd = ['ffmpeg', '-y', '-i', self.audio_file]
+            for opts in outputs:
+                ffmpeg_cmd.extend(opts)
+            ffmpeg_cmd.extend(self.get_loudness_options())
+
+            result = self.run_command(ffmpeg_cmd, stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE)
+
+            if result.returncode != 0:
+                if self.config.get('verbose'):
+                    print("[ydl] Single pass split failed, splitting " + \
+                        "one track per process")
+                if not self.split_file_parallel(outputs):
+                    # the album file is kept to split it again
+                    for opts in outputs:
+                        if os.path.exists(opts[-1]):
+                            os.remove(opts[-1])
+                    raise ui.UserError('Failed to split ' + self.audio_file)
+            else:
+                self.write_loudness(result.stderr, outputs)
+
+            os.remove(self.audio_file)
+
+    def split_stream(self):
+        """Cut all tracks from the stream URL in a single ffmpeg run, so
+        the album file is never written to disk
+        """
+        self.audio_file_ext, codec_opts = self.get_stream_codec()
+        outputs = self.get_split_outputs(codec_opts)
+        if len(outputs) == 0:
+            return False
+
+        print("[ydl] Running ffmpeg")
+        ffmpeg_cmd = ['ffmpeg', '-y'] + self.get_stream_input_options()
+        for opts in outputs:
+            ffmpeg_cmd.extend(opts)
+        ffmpeg_cmd.extend(self.get_loudness_options())
+
+        with self.stats.stage('download', self.info.get('id')):
+            result = self.run_command(ffmpeg_cmd, stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE)
+
+        if result.returncode != 0:
+            for opts in outputs:
+                if os.path.exists(opts[-1]):
+                    os.remove(opts[-1])
+            return False
+
+        self.write_loudness(result.stderr, outputs)
+        self.set_stage('downloaded')
+        return True
+
+    def get_loudness_options(self):
+        """Return the ffmpeg options measuring track and album loudness on
+        the splitting run, when `loudness` is set
+        """
+        if not self.config.get('loudness'):
+            return []
+        return loudness.get_ffmpeg_options(self.tracks)
+
+    def write_loudness(self, stderr, outputs):
+        """Write ReplayGain tags on the split tracks from the loudness
+        measured by the splitting run
+        """
+        if not self.config.get('loudness'):
+            return
+
+        results = loudness.parse_summaries(
+            stderr.decode('utf-8', 'replace'))
+        if results is None or len(results) != len(outputs) + 1:
+            print("[ydl] Error: Failed to measure loudness")
+            return
+
+        with self.stats.stage('loudness', self.info.get('id')):
+            for opts, track in zip(outputs, results):
+                loudness.write_tags(opts[-1], track, results[-1])
+
+    def get_split_outputs(self, codec_opts=None):
+        """Return the ffmpeg output options for every track in `self.tracks`
+
+        Tracks are copied unless other `codec_opts` are given.
+        """
+        outputs = []
+        file_id = os.path.basename(os.path.normpath(self.outdir))
+
+        for track in self.tracks:
+            opts = ['-ss', str(track['start']), '-to', str(track['end'])]
+            opts.extend(codec_opts or ['-acodec', 'copy'])
+
+            for k in track.keys():
+                opts.extend(['-metadata', '%s=%s' % (k, track[k])])
+
+            outfile = '%s/%03d-%s%s' % (self.outdir,
+                track['track'], file_id, self.audio_file_ext)
+            opts.extend([outfile])
+
+            outputs.append(opts)
+
+        return outputs
+
+    def split_file_parallel(self, outputs):
+        """Run one ffmpeg process per track, spread across the available
+        cores
+
+        Returns whether every track was split.
+        """
+        ffmpeg_cmd = ['ffmpeg', '-y', '-i', self.audio_file]
+        with ThreadPoolExecutor(max_workers=os.cpu_count() or 1) as pool:
+            futures = [pool.submit(self.run_command, ffmpeg_cmd + opts,
+                stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+                for opts in outputs]
+
+        return all(future.result().returncode == 0 for future in futures)
+
+    def clean_str(self, s):
+        return tracklist.clean_str(s)
+
+    def get_common_metadata(self):
+        """Tries to translate metadata parsed from video description into file
+        metadata.
+
+        Will also remove years from title.
+        """
+        metadata = {}
+
+        year = self.get_year()
+        if year is not None:
+            metadata['year'] = year
+
+        metadata['artist'], metadata['album'] = self.parse_title()
+
+        return metadata
+
+    def get_year(self):
+        year, self.info['title'] = tracklist.get_year(self.info.get('title'))
+        return year
+
+    def parse_title(self):
+        """Parse the title trying to find an "Artist - Album" pattern
+        """
+        return tracklist.parse_title(self.info.get('title'))
+
+    def to_seconds(self, time):
+        """Convert MM:SS to seconds
+        """
+        return tracklist.to_seconds(time)
+
+    def to_hms(self, seconds):
+        """Convert seconds to HH:MM:SS
+        """
+        return tracklist.to_hms(seconds)
+
+    def extract_tracks(self):
+        """Try different methods to extract tracks metadata
+        """
+        print("[ydl] Extracting tracks metadata")
+
+        self.tracks = []
+        if os.path.exists(self.audio_file):
+            self.tracks = self.extract_tracks_from_chapters()
+        elif self.config.get('verbose'):
+            print("[ydl] Audio file not found, won't look for chapters")
+
+        if len(self.tracks) > 0:
+            self.extract_tracks_cleanup()
+        else:
+            if self.config.get('verbose'):
+                print("[ydl] Chapters not found, trying video description")
+            self.tracks = self.extract_tracktimes_from_string(
+                self.info.get('description'))
+
+        if len(self.tracks) == 0 and self.config.get('detect_silence'):
+            with self.stats.stage('detect_silence', self.info.get('id')):
+                self.tracks = self.extract_tracks_from_silence()
+
+        common_metadata = self.get_common_metadata()
+
+        for i in range(0, len(self.tracks) - 1):
+            self.tracks[i].update(common_metadata)
+
+    def get_tracklist(self):
+        output = []
+        if len(self.tracks) > 1:
+            for track in self.tracks:
+                output.append("[ydl] %03d: %s (%s - %s)" % (
+                    track['track'],
+                    track['title'],
+                    self.to_hms(track['start']),
+                    self.to_hms(track['end'])))
+        else:
+            for track in self.tracks:
+                output.append("[ydl] %s (%s - %s)" % (
+                    track['title'],
+                    self.to_hms(track['start']),
+                    self.to_hms(track['end'])))
+
+        return "\n".join(output)
+
+    def extract_tracks_from_chapters(self):
+        """Read chapters tags on file to find times and metadata
+        """
+        tracks = []
+        probe = self.probe()
+
+        for index, chapter in enumerate(probe.get('chapters', [])):
+            track = {
+                'track': index + 1,
+                'start': float(chapter['start_time']),
+                'end': float(chapter['end_time']),
+            }
+            for key, value in chapter.get('tags', {}).items():
+                track[self.clean_str(key)] = self.clean_str(value)
+            tracks.append(track)
+
+        return tracks
+
+    def extract_tracks_from_silence(self):
+        """Split at the silences between tracks when there are no times
+
+        Only full albums and descriptions with a numbered list of titles are
+        scanned, and the list gives the expected number of tracks.
+        """
+        titles = tracklist.parse_track_titles(self.info.get('description'))
+        if not os.path.exists(self.audio_file) or \
+            (len(titles) == 0 and not self.fullalbum_stripped):
+            return []
+
+        if self.config.get('verbose'):
+            print("[ydl] Looking for silences between tracks")
+
+        if not self.info.get('duration'):
+            self.probe()
+
+        try:
+            times = silence.detect_tracks(self.audio_file,
+                self.info.get('duration'), len(titles) or None,
+                float(self.config.get('silence_threshold')))
+        except ImportError:
+            print("[ydl] Error: NumPy is needed to detect silences")
+            return []
+
+        tracks = []
+        for index, (start, end) in enumerate(times):
+            tracks.append({
+                'track': index + 1,
+                'start': start,
+                'end': end,
+                'title': titles[index] if titles else \
+                    'Track %d' % (index + 1)
+            })
+
+        return tracks
+
+    def probe(self):
+        """Return `ffprobe` information on chapters and format of the audio
+        file
+
+        With `keep_files`, results are cached next to the audio file by its
+        size and modification time, so kept files are not probed again, and
+        the cache goes away with the entry. A missing duration is also set
+        from it.
+        """
+        if getattr(self, 'probe_data', None) is not None:
+            return self.probe_data
+
+        stat = os.stat(self.audio_file)
+        cache_file = os.path.splitext(self.audio_file)[0] + '.probe.json'
+
+        self.probe_data = None
+        try:
+            with open(cache_file) as f:
+                cached = json.load(f)
+            if cached['size'] == stat.st_size and \
+                cached['mtime'] == stat.st_mtime:
+                self.probe_data = cached['probe']
+        except (OSError, ValueError, KeyError):
+            pass
+
+        if self.probe_data is None:
+            ffprobe_cmd = ['ffprobe', '-v', 'quiet', '-print_format', 'json',
+                '-show_chapters', '-show_format', self.audio_file]
+            result = self.run_command(ffprobe_cmd, stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE)
+            try:
+                self.probe_data = json.loads(result.stdout.decode())
+            except ValueError:
+                self.probe_data = {}
+
+            if self.config.get('keep_files'):
+                with open(cache_file, 'w') as f:
+                    json.dump({
+                        'size': stat.st_size,
+                        'mtime': stat.st_mtime,
+                        'probe': self.probe_data
+                    }, f)
+
+        duration = self.probe_data.get('format', {}).get('duration')
+        if duration and not self.info.get('duration'):
+            self.info['duration'] = float(duration)
+
+        return self.probe_data
+
+    def extract_tracktimes_from_string(self, s):
+        """Try to find HH:MM patterns as track times on description
+        """
+        tracks, skipped = tracklist.parse_tracklist(s,
+            self.info.get('duration'))
+
+        for index in skipped:
+            print('[ydl] Skipping track %d: incorrect timing' % index)
+
+        return tracks
+
+    def extract_tracks_cleanup(self):
+        """Clean tracks after extraction process
+        """
+        for track in self.tracks:
+            if 'title' in track:
+                track['title'] = tracklist.strip_track_number(track['title'])
+
+    def set_single_file_data(self):
+        artist, title = self.parse_title()
+        self.tracks = [{
+            'artist': artist,
+            'title': title,
+            'start': 0,
+            'end': self.info.get('duration') - 0.05
+        }]
+        # full albums without a tracklist are imported as a one track album
+        if self.is_album():
+            self.tracks[0]['track'] = 1
+
+    def write_dummy_mp3(self):
+        """Create dummy mp3 files to test an import into beets
+        """
+        if not os.path.exists(self.outdir):
+            os.makedirs(self.outdir)
+
+        if len(self.tracks) > 0:
+            self.write_dummy_mp3_tracks()
+        else:
+            self.write_dummy_mp3_file()
+
+    def write_dummy_mp3_tracks(self):
+        for track in self.tracks:
+            self.write_dummy_mp3_file(track)
+
+    def write_dummy_mp3_file(self, track=False):
+        if self.is_album():
+            outmp3 = '%s/%03d-%s%s' % (self.outdir,
+                track['track'], self.info.get('id'), self.audio_file_ext)
+            outwav = '%s/%03d-%s%s' % (self.outdir,
+                track['track'], self.info.get('id'), '.wav')
+        else:
+            outmp3 = '%s/%s%s' % (self.outdir,
+                self.info.get('id'), self.audio_file_ext)
+            outwav = '%s/%s%s' % (self.outdir, self.info.get('id'), '.wav')
+
+        self.write_silent_wav(outwav, track['end'] - track['start'])
+
+        ffmpeg_cmd = ['ffmpeg', '-y', '-i', outwav, '-vn', '-ar',
+            '44100', '-ac', '1', '-ab', '8k']
+        for k in track.keys():
+            if k == 'track':
+                value = str(track[k])
+            else:
+                value = '"' + str(track[k]) + '"'
+            ffmpeg_cmd.extend(['-metadata', '%s=%s' % (k, value)])
+        ffmpeg_cmd.append(outmp3)
+
+        self.run_command(ffmpeg_cmd, stderr=subprocess.PIPE,
+            stdout=subprocess.PIPE)
+        os.remove(outwav)
+
+    def write_silent_wav(self, path, seconds, rate=8000):
+        """Write `seconds` of silence as a mono 16 bit WAV file
+
+        Frames are written from a single zeroed buffer, one second at a time.
+        """
+        frames = int(max(0, float(seconds)) * rate)
+        silence = bytes(rate * 2)
+
+        with wave.open(path, 'wb') as out:
+            out.setnchannels(1)
+            out.setsampwidth(2)
+            out.setframerate(rate)
+            while frames > 0:
+                chunk = min(frames, rate)
+                out.writeframesraw(silence[:chunk * 2])
+                frames -= chunk
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+# Copyright 2016, Vinicius Massuchetto.
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+
+"""Chromaprint fingerprints of split tracks, and the MusicBrainz ids they
+were imported with.
+"""
+
+from hashlib import md5
+import json
+import sqlite3
+import threading
+
+
+def get_fpcalc_command(path, length=120):
+    return ['fpcalc', '-json', '-length', str(length), path]
+
+
+def parse_fpcalc(output):
+    """Return the `(duration, fingerprint)` printed by `fpcalc -json`
+    """
+    data = json.loads(output)
+    return float(data['duration']), data['fingerprint']
+
+
+def get_key(fingerprint):
+    return md5(fingerprint.encode()).hexdigest()
+
+
+def write_tags(path, fingerprint, mb_trackid=None, mb_albumid=None):
+    """Write the fingerprint of `path`, and its MusicBrainz ids if known
+    """
+    try:
+        from mediafile import MediaFile
+    except ImportError:
+        from beets.mediafile import MediaFile
+
+    f = MediaFile(path)
+    f.acoustid_fingerprint = fingerprint
+    if mb_trackid:
+        f.mb_trackid = mb_trackid
+    if mb_albumid:
+        f.mb_albumid = mb_albumid
+    f.save()
+
+
+class FingerprintCache():
+    """Fingerprints of split tracks and the MusicBrainz ids of their
+    fingerprints, in a SQLite database
+
+    Tracks are looked up by their entry id and times, so splitting the same
+    source again doesn't run `fpcalc`. MusicBrainz ids are recorded when
+    tracks are imported, and found again by exact fingerprint.
+    """
+    def __init__(self, path):
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        with self.db:
+            self.db.execute("""CREATE TABLE IF NOT EXISTS tracks (
+                track TEXT PRIMARY KEY,
+                fingerprint TEXT,
+                duration REAL)""")
+            self.db.execute("""CREATE TABLE IF NOT EXISTS mbids (
+                fingerprint TEXT PRIMARY KEY,
+                mb_trackid TEXT,
+                mb_albumid TEXT)""")
+
+    def get_track(self, track):
+        """Return the `(duration, fingerprint)` of `track`, or `None`
+        """
+        with self.lock:
+            return self.db.execute("SELECT duration, fingerprint " + \
+                "FROM tracks WHERE track = ?", (track,)).fetchone()
+
+    def set_track(self, track, duration, fingerprint):
+        with self.lock, self.db:
+            self.db.execute("INSERT OR REPLACE INTO tracks " + \
+                "(track, fingerprint, duration) VALUES (?, ?, ?)",
+                (track, fingerprint, duration))
+
+    def get_mbids(self, fingerprint):
+        """Return the `(mb_trackid, mb_albumid)` `fingerprint` was imported
+        with, or `None`
+        """
+        with self.lock:
+            return self.db.execute("SELECT mb_trackid, mb_albumid " + \
+                "FROM mbids WHERE fingerprint = ?",
+                (get_key(fingerprint),)).fetchone()
+
+    def set_mbids(self, fingerprint, mb_trackid, mb_albumid=None):
+        with self.lock, self.db:
+            self.db.execute("INSERT OR REPLACE INTO mbids " + \
+                "(fingerprint, mb_trackid, mb_albumid) VALUES (?, ?, ?)",
+                (get_key(fingerprint), mb_trackid, mb_albumid or None))
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
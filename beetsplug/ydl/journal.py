@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+# Copyright 2016, Vinicius Massuchetto.
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+
+"""A persistent record of how far each entry got, used to resume runs.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+
+# stages in the order they are completed
+STAGES = ('resolved', 'downloaded', 'split', 'imported')
+
+
+class Journal():
+    """Record the last completed stage of every entry in a SQLite database
+
+    Besides the stage, the resolved entry information and the tracks found
+    on it are kept, so a resumed run can continue without resolving or
+    splitting the entry again. Failures are recorded as an error next to the
+    last completed stage.
+    """
+    def __init__(self, path):
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        with self.db:
+            self.db.execute("""CREATE TABLE IF NOT EXISTS entries (
+                id TEXT PRIMARY KEY,
+                stage TEXT,
+                info TEXT,
+                tracks TEXT,
+                error TEXT,
+                updated REAL)""")
+
+    def get(self, entry_id):
+        """Return the journal of `entry_id` as a dict, or `None`
+        """
+        with self.lock:
+            row = self.db.execute("SELECT stage, info, tracks, error " + \
+                "FROM entries WHERE id = ?", (entry_id,)).fetchone()
+
+        if row is None:
+            return None
+
+        return {
+            'stage': row[0],
+            'info': json.loads(row[1]) if row[1] else None,
+            'tracks': json.loads(row[2]) if row[2] else None,
+            'error': row[3],
+        }
+
+    def set(self, entry_id, stage, info=None, tracks=None):
+        """Record that `entry_id` completed `stage`, clearing its last error
+
+        `info` and `tracks` are only written when given.
+        """
+        fields = {'stage': stage, 'error': None, 'updated': time.time()}
+        if info is not None:
+            fields['info'] = json.dumps(info, default=str)
+        if tracks is not None:
+            fields['tracks'] = json.dumps(tracks, default=str)
+        self.update(entry_id, fields)
+
+    def fail(self, entry_id, error):
+        """Record an error on `entry_id`, keeping its last completed stage
+        """
+        self.update(entry_id, {'error': str(error), 'updated': time.time()})
+
+    def update(self, entry_id, fields):
+        columns = sorted(fields.keys())
+        with self.lock, self.db:
+            self.db.execute("INSERT OR IGNORE INTO entries (id) VALUES (?)",
+                (entry_id,))
+            self.db.execute("UPDATE entries SET %s WHERE id = ?" % \
+                ', '.join('%s = ?' % c for c in columns),
+                [fields[c] for c in columns] + [entry_id])
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+
+def reached(stage, wanted):
+    """Check if `stage` is `wanted` or a later one
+    """
+    return stage in STAGES and wanted in STAGES and \
+        STAGES.index(stage) >= STAGES.index(wanted)
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+# Copyright 2016, Vinicius Massuchetto.
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+
+"""EBU R128 loudness of split tracks, measured by the splitting ffmpeg run.
+"""
+
+import re
+
+# ReplayGain 2.0 reference level, the same as beets' `replaygain` plugin
+REFERENCE = -18.0
+
+SUMMARY_REGEX = re.compile(
+    r'\[Parsed_ebur128_(?P<index>[0-9]+) @ [^\]]*\] Summary:' + \
+    r'.*?I:\s+(?P<loudness>-?[0-9.]+|-inf) LUFS' + \
+    r'.*?Peak:\s+(?P<peak>-?[0-9.]+|-inf) dBFS', re.DOTALL)
+
+
+def get_ffmpeg_options(tracks):
+    """Return ffmpeg options measuring the loudness of every track, and of
+    all of them, from the first input
+
+    The audio is split into one `ebur128` filter per track plus one for the
+    album, all written to a null output, so the input is only decoded once
+    along with the other outputs of the same run.
+    """
+    measure = 'ebur128=peak=sample:framelog=verbose'
+    graph = ['[0:a]asplit=%d%s' % (len(tracks) + 1,
+        ''.join('[s%d]' % i for i in range(len(tracks) + 1)))]
+    for i, track in enumerate(tracks):
+        graph.append('[s%d]atrim=start=%s:end=%s,%s[l%d]' % (i,
+            track['start'], track['end'], measure, i))
+    graph.append('[s%d]%s[l%d]' % (len(tracks), measure, len(tracks)))
+
+    opts = ['-filter_complex', ';'.join(graph)]
+    for i in range(len(tracks) + 1):
+        opts.extend(['-map', '[l%d]' % i])
+    return opts + ['-f', 'null', '-']
+
+
+def parse_summaries(stderr):
+    """Return the `(loudness, peak)` of every track and of the album from
+    the ffmpeg output, or `None` when they're not all there
+
+    Loudness is in LUFS and peaks are linear, silent tracks have `None`.
+    """
+    results = []
+    for match in SUMMARY_REGEX.finditer(stderr):
+        loudness, peak = match.group('loudness', 'peak')
+        results.append((int(match.group('index')),
+            None if loudness == '-inf' else float(loudness),
+            0.0 if peak == '-inf' else 10 ** (float(peak) / 20)))
+
+    if len(results) < 2:
+        return None
+
+    # summaries are printed in no particular order, but filters are numbered
+    # in the order tracks were added
+    results.sort()
+    return [(loudness, peak) for index, loudness, peak in results]
+
+
+def get_gain(loudness):
+    return None if loudness is None else round(REFERENCE - loudness, 2)
+
+
+def write_tags(path, track, album):
+    """Write the ReplayGain tags of `path` from its `track` and `album`
+    `(loudness, peak)`
+    """
+    try:
+        from mediafile import MediaFile
+    except ImportError:
+        from beets.mediafile import MediaFile
+
+    f = MediaFile(path)
+    for prefix, (loudness, peak) in (('rg_track_', track), ('rg_album_',
+        album)):
+        gain = get_gain(loudness)
+        if gain is not None:
+            setattr(f, prefix + 'gain', gain)
+            setattr(f, prefix + 'peak', round(peak, 6))
+    f.save()
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+# Copyright 2016, Vinicius Massuchetto.
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+
+"""youtube-dl state shared across a `beet ydl` run.
+"""
+
+from contextlib import contextmanager
+import threading
+
+# youtube-dl takes long to import, so it's only imported when `beet ydl` runs,
+# see `new_youtubedl`
+YoutubeDL = None
+
+
+def new_youtubedl(params):
+    """Return a new `YoutubeDL` instance, importing youtube-dl on first use
+    """
+    global YoutubeDL
+    if YoutubeDL is None:
+        from youtube_dl import YoutubeDL
+
+    return YoutubeDL(params)
+
+
+class Session():
+    """A pool of `YoutubeDL` instances created once per run and shared by all
+    sources
+
+    `YoutubeDL` is not thread safe, so each thread borrows its own instance
+    with `youtubedl()`. Instances are given back to the pool afterwards and
+    reused by the next source, keeping their extractors, logins and netrc
+    credentials. All of them share the URL opener and cookie jar of the
+    first one.
+    """
+    def __init__(self, params):
+        self.params = params
+        self.lock = threading.Lock()
+        self.main = new_youtubedl(params)
+        self.free = [self.main]
+        self.created = 1
+
+    def new_instance(self):
+        y = new_youtubedl(self.params)
+        if hasattr(self.main, '_opener'):
+            y.cookiejar = self.main.cookiejar
+            y._opener = self.main._opener
+        with self.lock:
+            self.created += 1
+        return y
+
+    @contextmanager
+    def youtubedl(self):
+        """Borrow a `YoutubeDL` instance from the pool
+        """
+        y = None
+        with self.lock:
+            if len(self.free) > 0:
+                y = self.free.pop()
+        if y is None:
+            y = self.new_instance()
+
+        try:
+            yield y
+        finally:
+            with self.lock:
+                self.free.append(y)
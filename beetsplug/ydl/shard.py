@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+# Copyright 2016, Vinicius Massuchetto.
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+
+"""Coordination of several workers sharing a cache and a library.
+"""
+
+from hashlib import md5
+import os
+import socket
+import time
+import uuid
+
+
+def parse_shard(value):
+    """Parse a `i/N` shard, numbered from 1, into `(i, N)`
+    """
+    try:
+        index, count = [int(part) for part in value.split('/')]
+    except ValueError:
+        raise ValueError('Shards look like 1/4, not %s' % value)
+
+    if count < 1 or index < 1 or index > count:
+        raise ValueError('Shard %s is out of range' % value)
+
+    return index, count
+
+
+def in_shard(entry_id, index, count):
+    """Check if `entry_id` belongs to shard `index` of `count`
+
+    Ids are hashed, so every worker gets the same partition without talking
+    to the others.
+    """
+    return int(md5(entry_id.encode()).hexdigest(), 16) % count == index - 1
+
+
+class FileLock():
+    """A lock file created with `O_EXCL`, which also works over NFS
+
+    The file holds the host, process and time of its owner. It's taken as
+    stale, and broken, when its owner on this host is gone, or when it was
+    not refreshed for `ttl` seconds.
+    """
+    def __init__(self, path, ttl=21600):
+        self.path = path
+        self.ttl = ttl
+        self.owner = '%s %d %s' % (socket.gethostname(), os.getpid(),
+            uuid.uuid4().hex)
+        self.held = False
+
+    def acquire(self, block=False, poll=1.0):
+        """Take the lock, returning `False` if someone else holds it
+
+        With `block`, wait until it's released instead.
+        """
+        while True:
+            if self.create() or (self.break_stale() and self.create()):
+                self.held = True
+                return True
+            if not block:
+                return False
+            time.sleep(poll)
+
+    def create(self):
+        try:
+            fd = os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_EXCL,
+                0o644)
+        except FileExistsError:
+            return False
+        with os.fdopen(fd, 'w') as f:
+            f.write(self.owner + '\n')
+        return True
+
+    def read(self):
+        try:
+            with open(self.path) as f:
+                return f.read().strip()
+        except OSError:
+            return None
+
+    def is_stale(self, owner=None):
+        """Check if the present lock file was left by a gone owner
+        """
+        owner = owner or self.read()
+        try:
+            if time.time() - os.path.getmtime(self.path) > self.ttl:
+                return True
+        except OSError:
+            return False
+
+        parts = (owner or '').split()
+        if len(parts) == 3 and parts[0] == socket.gethostname():
+            try:
+                os.kill(int(parts[1]), 0)
+            except ProcessLookupError:
+                return True
+            except (OSError, ValueError):
+                pass
+
+        return False
+
+    def break_stale(self):
+        """Remove the lock file if it's stale
+
+        It's renamed away first, so only one of the workers breaking it at
+        the same time succeeds, and put back if another one took it in the
+        meantime.
+        """
+        owner = self.read()
+        if owner is None or not self.is_stale(owner):
+            return False
+
+        stale = '%s.%s' % (self.path, uuid.uuid4().hex)
+        try:
+            os.rename(self.path, stale)
+        except OSError:
+            return False
+
+        with open(stale) as f:
+            if f.read().strip() != owner:
+                try:
+                    os.link(stale, self.path)
+                except OSError:
+                    pass
+                os.remove(stale)
+                return False
+
+        os.remove(stale)
+        return True
+
+    def refresh(self):
+        """Keep the lock from going stale while it's held
+        """
+        if self.held:
+            os.utime(self.path)
+
+    def release(self):
+        if self.held and self.read() == self.owner:
+            os.remove(self.path)
+        self.held = False
+
+    def __enter__(self):
+        self.acquire(block=True)
+        return self
+
+    def __exit__(self, *args):
+        self.release()
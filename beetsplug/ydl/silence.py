@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+# Copyright 2016, Vinicius Massuchetto.
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+
+"""Find track boundaries on album files from the silences between tracks.
+
+Needs NumPy, which is only imported when a file is scanned.
+"""
+
+import subprocess
+
+# decoded audio is mono at this rate, enough to measure loudness
+RATE = 8000
+# length of the windows loudness is measured on, in seconds
+WINDOW = 0.1
+# windows read from ffmpeg at a time
+CHUNK_WINDOWS = 600
+
+
+def find_gaps(path, threshold=-45.0, min_silence=0.5):
+    """Return the silences on `path` as `(start, end, level)` tuples
+
+    The file is decoded by ffmpeg to 16 bit PCM and read in chunks, and the
+    RMS level of every window is compared with `threshold`, in dBFS. Only
+    the silences are kept, so memory doesn't grow with the file length.
+    """
+    import numpy
+
+    window = int(RATE * WINDOW)
+    chunk_size = window * CHUNK_WINDOWS * 2
+    cmd = ['ffmpeg', '-v', 'quiet', '-i', path, '-vn', '-ac', '1',
+        '-ar', str(RATE), '-f', 's16le', '-']
+
+    gaps = []
+    start = None # first window of the silence being read
+    total = 0.0 # sum of its window levels
+    index = 0
+
+    process = subprocess.Popen(cmd, stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL)
+    try:
+        while True:
+            data = process.stdout.read(chunk_size)
+            windows = len(data) // (window * 2)
+            if windows == 0:
+                break
+
+            samples = numpy.frombuffer(data[:windows * window * 2],
+                dtype='<i2').astype(numpy.float32).reshape(windows, window)
+            rms = numpy.sqrt(numpy.mean(samples * samples, axis=1))
+            db = 20 * numpy.log10(rms / 32768 + 1e-10)
+            silent = db < threshold
+
+            # runs of silent and loud windows on the chunk
+            edges = numpy.flatnonzero(numpy.diff(silent.astype(numpy.int8)))
+            bounds = [0] + (edges + 1).tolist() + [windows]
+
+            for first, last in zip(bounds[:-1], bounds[1:]):
+                if silent[first]:
+                    if start is None:
+                        start = index + first
+                        total = 0.0
+                    total += float(db[first:last].sum())
+                elif start is not None:
+                    end = index + first
+                    gaps.append((start, end, total / (end - start)))
+                    start = None
+
+            index += windows
+    finally:
+        process.stdout.close()
+        process.wait()
+
+    if start is not None:
+        gaps.append((start, index, total / (index - start)))
+
+    return [(s * WINDOW, e * WINDOW, level) for s, e, level in gaps
+        if (e - s) * WINDOW >= min_silence]
+
+
+def pick_splits(gaps, duration, count=None, min_track=30.0):
+    """Choose split points from `gaps`, the middle of the chosen silences
+
+    Longer and quieter silences are preferred, and no track gets shorter
+    than `min_track` seconds. With the expected track `count`, exactly
+    `count - 1` points are returned, or none when they can't be found.
+    """
+    points = []
+    for start, end, level in sorted(gaps,
+        key=lambda gap: (gap[0] - gap[1], gap[2])):
+        if start <= 0 or end >= duration:
+            continue # silences at the edges don't split anything
+        point = (start + end) / 2
+        if point < min_track or duration - point < min_track or \
+            any(abs(point - other) < min_track for other in points):
+            continue
+        points.append(point)
+        if count is not None and len(points) == count - 1:
+            break
+
+    if count is not None and len(points) != count - 1:
+        return []
+
+    return sorted(points)
+
+
+def detect_tracks(path, duration, count=None, threshold=-45.0,
+        min_silence=0.5, min_track=30.0):
+    """Return the `(start, end)` times of the tracks on `path`
+
+    Returns an empty list when less than two tracks are found.
+    """
+    if not duration or duration <= 0:
+        return []
+
+    points = pick_splits(find_gaps(path, threshold, min_silence), duration,
+        count, min_track)
+    if len(points) == 0:
+        return []
+
+    tracks = []
+    bounds = [0] + points + [duration]
+    for index in range(len(bounds) - 1):
+        end = bounds[index + 1]
+        if index < len(points):
+            end -= 0.05
+        tracks.append((round(bounds[index], 2), round(end, 2)))
+
+    return tracks
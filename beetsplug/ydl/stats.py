@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+# Copyright 2016, Vinicius Massuchetto.
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+
+"""Timing and counters for a `beet ydl` run.
+"""
+
+from contextlib import contextmanager
+import json
+import threading
+import time
+
+
+class Stats():
+    """Collect per-entry and per-run stage timings and counters
+
+    Every stage timing and counter is added both to its entry, when there is
+    one, and to the run totals. It is safe to use from several threads.
+    """
+    def __init__(self, verbose=False):
+        self.verbose = verbose
+        self.lock = threading.Lock()
+        self.start = time.time()
+        self.run = {}
+        self.entries = {}
+
+    def add(self, name, value, entry=None):
+        """Add `value` to the `name` counter of `entry` and of the run
+        """
+        with self.lock:
+            targets = [self.run]
+            if entry is not None:
+                targets.append(self.entries.setdefault(entry, {}))
+            for target in targets:
+                target[name] = target.get(name, 0) + value
+
+    @contextmanager
+    def stage(self, name, entry=None):
+        """Time the wrapped block as stage `name`
+        """
+        start = time.time()
+        try:
+            yield
+        finally:
+            elapsed = time.time() - start
+            self.add(name + '_time', elapsed, entry)
+            self.add(name + '_count', 1, entry)
+            if self.verbose:
+                print("[ydl] %s%s took %.2fs" % (name,
+                    ' ' + entry if entry else '', elapsed))
+
+    def summary(self):
+        with self.lock:
+            run = dict(self.run)
+            run['wall_time'] = time.time() - self.start
+            run['entries'] = len(self.entries)
+            return {
+                'run': run,
+                'entries': dict((k, dict(v)) for k, v in self.entries.items()),
+            }
+
+    def write(self, out):
+        json.dump(self.summary(), out, indent=2, sort_keys=True)
+        out.write('\n')
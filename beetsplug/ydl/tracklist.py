@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+# Copyright 2016, Vinicius Massuchetto.
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+
+"""Parse titles and tracklists from video titles and descriptions.
+
+Patterns are compiled once when the module is imported, and descriptions are
+read in a single pass over their lines.
+"""
+
+import re
+
+TIME = r'[0-9]?[0-9]?:?[012345]?[0-9]:[012345][0-9]'
+
+FULLALBUM_REGEX = re.compile(r'\S*?(fullalbum|full[^a-z]+album)\S*?',
+    re.IGNORECASE)
+YEAR_REGEX = re.compile(r'[^\S]?([12][0-9]{3})[^\S]?')
+TITLE_REGEX = re.compile(r'(.*?)[-~|*%#](.*)')
+NON_ALNUM_REGEX = re.compile(r'[^0-9a-zA-Z ]')
+SPACES_REGEX = re.compile(r'\s+')
+TRACK_NUMBER_REGEX = re.compile(r'^\s*?[0-9]+\s*?[^0-9a-zA-Z]*?\s*?')
+
+# a numbered line without times, like `1. Title` or `01 - Title`
+NUMBERED_REGEX = re.compile(r'^\s*(?P<number>[0-9]{1,2})\s*[.):-]\s*' + \
+    r'(?P<title>\S.*?)\s*$', re.MULTILINE)
+
+# a track time, optionally followed by an end time for `start - end` ranges
+TRACK_REGEX = re.compile(
+    r'^(?P<before>.*?)(?P<start>' + TIME + r')' + \
+    r'(?:\s*[-~]+\s*(?P<end>' + TIME + r'))?(?P<after>.*)$', re.MULTILINE)
+
+
+def clean_str(s):
+    s = NON_ALNUM_REGEX.sub('', s)
+    s = SPACES_REGEX.sub(' ', s)
+    return s.strip()
+
+
+def to_seconds(time):
+    """Convert [HH:]MM:SS to seconds
+    """
+    secs = 0
+    for part in time.split(':'):
+        secs = secs * 60 + int(part or 0)
+
+    return secs
+
+
+def to_hms(seconds):
+    """Convert seconds to HH:MM:SS
+    """
+    seconds, sec = divmod(float(seconds), 60)
+    hr, min = divmod(seconds, 60)
+
+    return "%d:%02d:%02d" % (hr, min, sec)
+
+
+def strip_fullalbum(title):
+    """Remove '[Full Album]' entries from `title`
+
+    Returns the new title and whether anything was removed.
+    """
+    stripped = FULLALBUM_REGEX.sub('', title)
+    return stripped, stripped != title
+
+
+def get_year(title):
+    """Find a year at the beginning of `title`
+
+    Returns the year, or `None`, and the title without years.
+    """
+    matches = YEAR_REGEX.match(title)
+    if matches:
+        return matches.group(1), YEAR_REGEX.sub('', title)
+
+    return None, title
+
+
+def parse_title(title):
+    """Parse the title trying to find an "Artist - Album" pattern
+    """
+    matches = TITLE_REGEX.match(title)
+    if matches:
+        first, second = matches.group(1), matches.group(2)
+
+    # in beets we trust
+    else:
+        first = second = title
+
+    return clean_str(first), clean_str(second)
+
+
+def strip_track_number(title):
+    """Remove the track number from the beginning of `title`
+    """
+    return TRACK_NUMBER_REGEX.sub('', title).strip()
+
+
+def parse_tracklist(text, duration=None):
+    """Find track times on the lines of `text`
+
+    Times can be at the beginning or at the end of a line, and can also be
+    `start - end` ranges. Tracks without an end time end where the next one
+    starts, and the last one at `duration`.
+
+    Returns the tracks and the 1-based positions of the skipped ones.
+    """
+    lines = []
+    for match in TRACK_REGEX.finditer(text or ''):
+        start, end = match.group('start', 'end')
+        lines.append((
+            match.group('before') + ' ' + match.group('after'),
+            to_seconds(start),
+            to_seconds(end) if end else None
+        ))
+
+    tracks = []
+    skipped = []
+    count = len(lines)
+
+    for index, (title, start, end) in enumerate(lines):
+        if end is None and index == count - 1:
+            end = duration # total file duration
+        elif end is None:
+            end = lines[index + 1][1] - 0.05
+
+        if end is None or start > end:
+            skipped.append(index + 1)
+            continue
+
+        tracks.append({
+            'track': index - len(skipped) + 1,
+            'start': start,
+            'end': end,
+            'title': strip_track_number(clean_str(title))
+        })
+
+    return tracks, skipped
+
+
+def parse_track_titles(text):
+    """Find a numbered list of track titles without times on `text`
+
+    Only the first list numbered from 1 without gaps is read. Returns the
+    titles, or an empty list.
+    """
+    titles = []
+    for match in NUMBERED_REGEX.finditer(text or ''):
+        number = int(match.group('number'))
+        if number == len(titles) + 1:
+            titles.append(clean_str(match.group('title')))
+        elif len(titles) > 1:
+            break
+        elif number == 1:
+            titles = [clean_str(match.group('title'))]
+
+    return titles if len(titles) > 1 else []
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+# Copyright 2016, Vinicius Massuchetto.
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+
+"""Scheduling and locking for `beet ydl --watch`.
+"""
+
+import os
+import random
+import time
+
+
+class Lock():
+    """An exclusive lock on a file, held until `release` or the process
+    exits
+
+    It's taken with `flock`, or by locking the first byte of the file where
+    that's not available, like on Windows.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.fd = None
+
+    def acquire(self):
+        """Take the lock, returning `False` if another process holds it
+        """
+        self.fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            self.lock(True)
+        except OSError:
+            os.close(self.fd)
+            self.fd = None
+            return False
+
+        os.ftruncate(self.fd, 0)
+        os.write(self.fd, ('%d\n' % os.getpid()).encode())
+        return True
+
+    def release(self):
+        if self.fd is not None:
+            self.lock(False)
+            os.close(self.fd)
+            self.fd = None
+
+    def lock(self, locked):
+        try:
+            import fcntl
+        except ImportError:
+            import msvcrt
+            os.lseek(self.fd, 0, os.SEEK_SET)
+            msvcrt.locking(self.fd,
+                msvcrt.LK_NBLCK if locked else msvcrt.LK_UNLCK, 1)
+        else:
+            fcntl.flock(self.fd,
+                fcntl.LOCK_EX | fcntl.LOCK_NB if locked else fcntl.LOCK_UN)
+
+
+class Scheduler():
+    """Poll every URL on its own schedule
+
+    URLs are polled every `interval` seconds, give or take `jitter` of it,
+    so they don't all hit the network at once. After a failure the interval
+    doubles for every consecutive error, up to `max_backoff` seconds.
+    """
+    def __init__(self, urls, interval, jitter=0.1, max_backoff=86400):
+        self.interval = float(interval)
+        self.jitter = float(jitter)
+        self.max_backoff = float(max_backoff)
+        self.errors = dict((url, 0) for url in urls)
+        # the first polls are spread across the first interval
+        now = time.time()
+        self.next = dict((url, now + index * self.interval / len(urls))
+            for index, url in enumerate(urls))
+
+    def due(self):
+        """Return the URL to poll next and the seconds to wait for it
+        """
+        url = min(self.next, key=self.next.get)
+        return url, max(0, self.next[url] - time.time())
+
+    def done(self, url, ok=True):
+        """Schedule the next poll of `url` after polling it
+        """
+        if ok:
+            self.errors[url] = 0
+            delay = self.interval
+        else:
+            self.errors[url] += 1
+            delay = min(self.max_backoff,
+                self.interval * 2 ** self.errors[url])
+
+        delay *= 1 + random.uniform(-self.jitter, self.jitter)
+        self.next[url] = time.time() + delay
+        return delay
@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+# Copyright 2016, Vinicius Massuchetto.
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+
+"""A persistent queue of sources to be processed by `beet ydl` workers.
+"""
+
+import sqlite3
+import threading
+import time
+
+# rows written per transaction while adding sources
+BATCH_SIZE = 500
+
+
+class WorkQueue():
+    """Sources waiting to be processed, in a SQLite database
+
+    Every source is kept once, by URL and by entry id when it's known, so
+    adding the same list again costs one indexed lookup per source. Sources
+    are claimed by workers by priority, then in the order they were added.
+    """
+    def __init__(self, path):
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, timeout=60, check_same_thread=False,
+            isolation_level=None)
+        self.db.execute("""CREATE TABLE IF NOT EXISTS queue (
+            url TEXT PRIMARY KEY,
+            entry_id TEXT UNIQUE,
+            priority INTEGER DEFAULT 0,
+            state TEXT DEFAULT 'pending',
+            worker TEXT,
+            error TEXT,
+            added REAL,
+            updated REAL)""")
+        self.db.execute("""CREATE INDEX IF NOT EXISTS queue_pending
+            ON queue (state, priority DESC, added)""")
+
+    def add_all(self, sources, priority=0, get_id=None, is_done=None):
+        """Add the URLs or ids read from `sources`, returning how many were
+        new
+
+        `sources` is read lazily. Only new sources are passed to `get_id`,
+        to find their entry id, and to `is_done`, which marks the ones
+        already processed, like the ones in the library.
+        """
+        added = 0
+        pending = 0
+        with self.lock:
+            self.db.execute("BEGIN")
+            try:
+                for url in sources:
+                    if not self.add(url, priority, get_id, is_done):
+                        continue
+                    added += 1
+                    pending += 1
+                    if pending >= BATCH_SIZE:
+                        self.db.execute("COMMIT")
+                        self.db.execute("BEGIN")
+                        pending = 0
+                self.db.execute("COMMIT")
+            except BaseException:
+                self.db.execute("ROLLBACK")
+                raise
+
+        return added
+
+    def add(self, url, priority, get_id, is_done):
+        now = time.time()
+        cursor = self.db.execute("INSERT OR IGNORE INTO queue " + \
+            "(url, priority, added, updated) VALUES (?, ?, ?, ?)",
+            (url, priority, now, now))
+        if cursor.rowcount == 0:
+            return False
+
+        entry_id = get_id(url) if get_id is not None else None
+        if entry_id is None:
+            return True
+
+        try:
+            self.db.execute("UPDATE queue SET entry_id = ? WHERE url = ?",
+                (entry_id, url))
+        except sqlite3.IntegrityError:
+            # another URL of the same entry, kept so it's not looked up again
+            self.db.execute("UPDATE queue SET state = 'duplicate' " + \
+                "WHERE url = ?", (url,))
+            return False
+
+        if is_done is not None and is_done(entry_id):
+            self.db.execute("UPDATE queue SET state = 'done' WHERE url = ?",
+                (url,))
+            return False
+
+        return True
+
+    def claim(self, worker, ttl=None):
+        """Take the next pending source for `worker`, or `None`
+
+        With `ttl`, sources claimed by workers that didn't finish them in
+        `ttl` seconds are given back to the queue first.
+        """
+        with self.lock:
+            self.db.execute("BEGIN IMMEDIATE")
+            try:
+                now = time.time()
+                if ttl:
+                    self.db.execute("UPDATE queue SET state = 'pending' " + \
+                        "WHERE state = 'running' AND updated < ?",
+                        (now - ttl,))
+                row = self.db.execute("SELECT url FROM queue " + \
+                    "WHERE state = 'pending' " + \
+                    "ORDER BY priority DESC, added LIMIT 1").fetchone()
+                if row is not None:
+                    self.db.execute("UPDATE queue SET state = 'running', " + \
+                        "worker = ?, updated = ? WHERE url = ?",
+                        (worker, now, row[0]))
+                self.db.execute("COMMIT")
+            except BaseException:
+                self.db.execute("ROLLBACK")
+                raise
+
+        return row[0] if row is not None else None
+
+    def done(self, url):
+        self.update(url, 'done')
+
+    def fail(self, url, error):
+        self.update(url, 'failed', str(error))
+
+    def update(self, url, state, error=None):
+        with self.lock:
+            self.db.execute("UPDATE queue SET state = ?, error = ?, " + \
+                "updated = ? WHERE url = ?", (state, error, time.time(), url))
+
+    def counts(self):
+        """Return the number of sources on every state
+        """
+        with self.lock:
+            return dict(self.db.execute(
+                "SELECT state, COUNT(*) FROM queue GROUP BY state"))
+
+    def close(self):
+        with self.lock:
+            self.db.close()
@@ -20,6 +20,8 @@ setuptools.setup(
     install_requires=[
         'beets',
         'youtube-dl',
-        'pyxdg',
-    ]
+    ],
+    extras_require={
+        'silence': ['numpy'],
+    }
 )
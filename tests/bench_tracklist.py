@@ -0,0 +1,26 @@
+#!/usr/bin/env python
+"""Benchmark `beetsplug.ydl.tracklist` over the test corpus
+
+    python tests/bench_tracklist.py [iterations]
+"""
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from test_tracklist import load_corpus, parse
+
+iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+corpus = load_corpus()
+
+total = 0
+for name, source in corpus.items():
+    elapsed = timeit.timeit(lambda: parse(source), number=iterations)
+    total += elapsed
+    print('%-20s %8.2f us/parse' % (name, elapsed / iterations * 1e6))
+
+print('%-20s %8.2f us/parse' % ('average',
+    total / iterations / len(corpus) * 1e6))
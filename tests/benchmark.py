@@ -0,0 +1,159 @@
+#!/usr/bin/env python
+"""Offline end-to-end benchmark of the ydl plugin
+
+Runs the plugin against `FakeYoutubeDL` and a temporary beets library, and
+reports wall and CPU time spent on each stage:
+
+    python tests/benchmark.py                  # playlists of 1, 100 and 1000
+    python tests/benchmark.py 10 50            # custom playlist sizes
+    python tests/benchmark.py --no-download 1000
+
+CPU time includes child processes like ffmpeg. Stages are measured
+inclusively, so `process_item` also counts `extract_tracks` and
+`split_file`. Downloads and splits need `ffmpeg` on the path.
+"""
+
+import argparse
+import contextlib
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+STAGES = ['youtubedl', 'process_item', 'extract_tracks', 'split_file',
+    'import']
+
+
+def cpu_time():
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return time.process_time() + children.ru_utime + children.ru_stime
+
+
+class StageTimer():
+    """Wrap plugin methods to add up their wall and CPU time
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.stats = dict((stage, [0, 0.0, 0.0]) for stage in STAGES)
+
+    def wrap(self, cls, method, stage):
+        func = getattr(cls, method)
+        timer = self
+
+        def wrapper(*args, **kwargs):
+            wall, cpu = time.perf_counter(), cpu_time()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                with timer.lock:
+                    stats = timer.stats[stage]
+                    stats[0] += 1
+                    stats[1] += time.perf_counter() - wall
+                    stats[2] += cpu_time() - cpu
+
+        setattr(cls, method, wrapper)
+
+    def report(self, entries, elapsed):
+        print('\n%d entries, %.2fs' % (entries, elapsed))
+        print('  %-16s %8s %10s %10s %12s' % ('stage', 'calls', 'wall (s)',
+            'cpu (s)', 'wall/call'))
+        for stage in STAGES:
+            calls, wall, cpu = self.stats[stage]
+            print('  %-16s %8d %10.3f %10.3f %12.4f' % (stage, calls, wall,
+                cpu, wall / calls if calls else 0))
+
+
+def setup(tmpdir):
+    """Point beets at a temporary config directory and library
+    """
+    os.environ['BEETSDIR'] = os.path.join(tmpdir, 'config')
+    os.makedirs(os.environ['BEETSDIR'])
+
+    from beets import config
+    config.read(user=False, defaults=True)
+    config['directory'] = os.path.join(tmpdir, 'music')
+    config['import'].set({
+        'autotag': False,
+        'quiet': True,
+        'copy': False,
+        'move': False,
+        'write': False,
+        'resume': False,
+        'incremental': False,
+        'log': None,
+    })
+
+    import beetsplug.ydl
+    import beetsplug.ydl.session
+    from fake_youtubedl import FakeYoutubeDL
+    beetsplug.ydl.session.YoutubeDL = FakeYoutubeDL
+
+    return beetsplug.ydl
+
+
+def run(ydl, timer, tmpdir, entries, download):
+    from beets.library import Library
+
+    libpath = os.path.join(tmpdir, 'library-%d.db' % entries)
+    lib = Library(libpath, os.path.join(tmpdir, 'music'))
+
+    plugin = ydl.YdlPlugin()
+    plugin.config.update({
+        'download': download,
+        'split_files': download,
+        'import': download,
+        'batch_import': True,
+        'keep_files': False,
+        'verbose': False,
+    })
+    plugin.lib = lib
+    plugin.library_ids = plugin.load_library_ids(lib)
+
+    timer.reset()
+    start = time.perf_counter()
+    with open(os.devnull, 'w') as devnull, \
+            contextlib.redirect_stdout(devnull):
+        plugin.youtubedl(lib, None, 'fake:playlist:%d' % entries)
+        plugin.flush_imports()
+    timer.report(entries, time.perf_counter() - start)
+
+    lib._close()
+    shutil.rmtree(plugin.cache_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('sizes', nargs='*', type=int, default=[1, 100, 1000])
+    parser.add_argument('--no-download', action='store_false',
+        dest='download', help='only resolve entries and parse metadata')
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp(prefix='ydl-benchmark-')
+    try:
+        ydl = setup(tmpdir)
+
+        timer = StageTimer()
+        timer.wrap(ydl.YdlPlugin, 'youtubedl', 'youtubedl')
+        timer.wrap(ydl.YdlPlugin, 'process_item', 'process_item')
+        timer.wrap(ydl.YdlPlugin, 'extract_tracks', 'extract_tracks')
+        timer.wrap(ydl.YdlPlugin, 'split_file', 'split_file')
+        timer.wrap(ydl.YdlPlugin, 'flush_imports', 'import')
+
+        for size in args.sizes:
+            run(ydl, timer, tmpdir, size, args.download)
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
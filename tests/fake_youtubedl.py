@@ -0,0 +1,120 @@
+"""A local stand-in for `youtube_dl.YoutubeDL`
+
+It serves canned `extract_info` payloads and writes synthetic audio files
+instead of downloading anything. URLs look like:
+
+    fake:playlist:<entries>    a playlist of <entries> albums
+    fake:video:<id>            a single album
+
+Albums with an even number have their tracks as chapters on the audio file,
+the others have a tracklist in the description.
+"""
+
+import os
+import subprocess
+import tempfile
+
+TRACKS = 4
+TRACK_LENGTH = 30
+
+
+def get_video_info(video_id):
+    number = int(''.join(c for c in video_id if c.isdigit()) or 0)
+    chapters = number % 2 == 0
+    description = 'A synthetic album.\n\n'
+    if not chapters:
+        for track in range(TRACKS):
+            description += '%d:%02d Track %d\n' % (
+                divmod(track * TRACK_LENGTH, 60) + (track + 1,))
+
+    return {
+        'id': video_id,
+        'title': 'Fake Artist - Fake Album %d [Full Album]' % number,
+        'description': description,
+        'duration': TRACKS * TRACK_LENGTH,
+        'ext': 'mp3',
+        'chapters': chapters,
+        'webpage_url': 'fake:video:' + video_id,
+    }
+
+
+def write_audio_file(path, chapters=False, tracks=TRACKS,
+        track_length=TRACK_LENGTH):
+    """Write `tracks` tones of `track_length` seconds to `path`, optionally
+    with one chapter per tone
+    """
+    duration = tracks * track_length
+    cmd = ['ffmpeg', '-y', '-f', 'lavfi', '-i',
+        'sine=frequency=440:duration=%d' % duration]
+
+    metadata = None
+    if chapters:
+        metadata = tempfile.NamedTemporaryFile('w', suffix='.txt',
+            delete=False)
+        metadata.write(';FFMETADATA1\n')
+        for track in range(tracks):
+            metadata.write('[CHAPTER]\nTIMEBASE=1/1\nSTART=%d\nEND=%d\n'
+                'title=Track %d\n' % (track * track_length,
+                    (track + 1) * track_length, track + 1))
+        metadata.close()
+        cmd.extend(['-f', 'ffmetadata', '-i', metadata.name,
+            '-map', '0', '-map_chapters', '1'])
+
+    cmd.extend(['-ac', '1', '-b:a', '32k', path])
+    try:
+        subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+            check=True)
+    finally:
+        if metadata is not None:
+            os.remove(metadata.name)
+
+
+class FakeYoutubeDL():
+    """Serve canned information for `fake:` URLs
+    """
+    def __init__(self, params=None):
+        self.params = params or {}
+
+    def extract_info(self, url, download=True, process=True):
+        kind, arg = url.split(':', 2)[1:]
+
+        if kind == 'playlist':
+            ie_result = {
+                '_type': 'playlist',
+                'id': 'playlist' + arg,
+                'title': 'Fake playlist',
+                'entries': ({
+                    '_type': 'url',
+                    'id': 'fake%05d' % index,
+                    'url': 'fake:video:fake%05d' % index,
+                    'title': 'Fake Album %d' % index,
+                } for index in range(int(arg))),
+            }
+        else:
+            ie_result = get_video_info(arg)
+
+        if process:
+            return self.process_ie_result(ie_result, download)
+        return ie_result
+
+    def process_ie_result(self, ie_result, download=True, extra_info={}):
+        if ie_result.get('_type') == 'playlist':
+            ie_result['entries'] = [self.process_ie_result(entry, download)
+                for entry in ie_result['entries']]
+            return ie_result
+
+        info = get_video_info(ie_result['id'])
+        if download:
+            self.process_info(info)
+        return info
+
+    def process_info(self, info_dict):
+        ext = self.params['postprocessors'][0]['preferredcodec']
+        if ext == 'best':
+            ext = info_dict['ext']
+        path = self.params['outtmpl'] % {'id': info_dict['id'], 'ext': ext}
+        if not os.path.exists(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+
+        write_audio_file(path, info_dict.get('chapters'))
+        info_dict['_filename'] = path
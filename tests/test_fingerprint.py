@@ -0,0 +1,43 @@
+"""Tests for `beetsplug.ydl.fingerprint`
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from beetsplug.ydl import fingerprint
+
+
+class FingerprintTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.cache = fingerprint.FingerprintCache(
+            os.path.join(self.tmpdir, 'fingerprints.db'))
+
+    def tearDown(self):
+        self.cache.close()
+        shutil.rmtree(self.tmpdir)
+
+    def test_parse_fpcalc(self):
+        self.assertEqual(fingerprint.parse_fpcalc(
+            '{"duration": 212.45, "fingerprint": "AQADtE"}'),
+            (212.45, 'AQADtE'))
+
+    def test_tracks(self):
+        self.assertIsNone(self.cache.get_track('id:1:0:60'))
+        self.cache.set_track('id:1:0:60', 60.0, 'AQADtE')
+        self.assertEqual(self.cache.get_track('id:1:0:60'), (60.0, 'AQADtE'))
+
+    def test_mbids(self):
+        self.assertIsNone(self.cache.get_mbids('AQADtE'))
+        self.cache.set_mbids('AQADtE', 'track-id', 'album-id')
+        self.cache.set_mbids('AQADtF', 'other-id', '')
+        self.assertEqual(self.cache.get_mbids('AQADtE'),
+            ('track-id', 'album-id'))
+        self.assertEqual(self.cache.get_mbids('AQADtF'), ('other-id', None))
+
+
+if __name__ == '__main__':
+    unittest.main()
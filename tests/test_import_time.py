@@ -0,0 +1,56 @@
+"""Import-time benchmark for the ydl plugin
+
+beets loads every enabled plugin on every command, so importing
+`beetsplug.ydl` and creating the plugin must not pull in youtube-dl.
+"""
+
+import json
+import os
+import subprocess
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import beets.plugins, beets.ui
+beets_time = time.perf_counter() - start
+start = time.perf_counter()
+import beetsplug.ydl
+beetsplug.ydl.YdlPlugin()
+json.dump({
+    'beets': beets_time,
+    'ydl': time.perf_counter() - start,
+    'modules': [m for m in ('youtube_dl', 'xdg') if m in sys.modules],
+}, sys.stdout)
+"""
+
+# generous, importing youtube-dl alone takes several times this long
+MAX_IMPORT_TIME = 0.1
+
+
+def measure():
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    result = subprocess.run([sys.executable, '-c', SCRIPT], env=env,
+        stdout=subprocess.PIPE, check=True)
+    return json.loads(result.stdout.decode())
+
+
+class ImportTimeTest(unittest.TestCase):
+
+    def test_heavy_modules_not_imported(self):
+        self.assertEqual(measure()['modules'], [])
+
+    def test_import_time(self):
+        # best of a few runs to leave out a cold disk cache
+        times = [measure()['ydl'] for i in range(3)]
+        self.assertLess(min(times), MAX_IMPORT_TIME)
+
+
+if __name__ == '__main__':
+    for i in range(5):
+        times = measure()
+        print('beets %.3fs, ydl plugin %.3fs' % (times['beets'],
+            times['ydl']))
@@ -0,0 +1,46 @@
+"""Tests for `beetsplug.ydl.loudness`
+"""
+
+import unittest
+
+from beetsplug.ydl import loudness
+
+SUMMARY = """[Parsed_ebur128_%d @ 0x5581] Summary:
+
+  Integrated loudness:
+    I:         %s LUFS
+    Threshold: -32.2 LUFS
+
+  Sample peak:
+    Peak:      %s dBFS
+"""
+
+TRACKS = [{'start': 0, 'end': 40}, {'start': 41, 'end': 77.7}]
+
+
+class LoudnessTest(unittest.TestCase):
+
+    def test_ffmpeg_options(self):
+        opts = loudness.get_ffmpeg_options(TRACKS)
+        self.assertEqual(opts[1].split(';')[1],
+            '[s0]atrim=start=0:end=40,' + \
+            'ebur128=peak=sample:framelog=verbose[l0]')
+        self.assertEqual(opts[2:], ['-map', '[l0]', '-map', '[l1]',
+            '-map', '[l2]', '-f', 'null', '-'])
+
+    def test_parse_summaries(self):
+        stderr = 'size=1kB\n' + SUMMARY % (5, '-20.0', '-6.0') + \
+            SUMMARY % (2, '-inf', '-inf') + SUMMARY % (4, '-22.0', '0.0')
+        results = loudness.parse_summaries(stderr)
+        self.assertEqual(results[0], (None, 0.0))
+        self.assertEqual(results[1], (-22.0, 1.0))
+        self.assertEqual(results[2][0], -20.0)
+        self.assertAlmostEqual(results[2][1], 0.501, places=3)
+        self.assertEqual(loudness.get_gain(results[2][0]), 2.0)
+
+    def test_missing_summaries(self):
+        self.assertIsNone(loudness.parse_summaries('size=1kB\n'))
+
+
+if __name__ == '__main__':
+    unittest.main()
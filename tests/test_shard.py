@@ -0,0 +1,65 @@
+"""Tests for `beetsplug.ydl.shard`
+"""
+
+import os
+import shutil
+import socket
+import tempfile
+import unittest
+
+from beetsplug.ydl import shard
+
+
+class ShardTest(unittest.TestCase):
+
+    def test_parse_shard(self):
+        self.assertEqual(shard.parse_shard('2/4'), (2, 4))
+        for value in ('0/4', '5/4', '1', 'a/b'):
+            with self.subTest(value=value):
+                self.assertRaises(ValueError, shard.parse_shard, value)
+
+    def test_partition(self):
+        ids = ['id%04d' % i for i in range(1000)]
+        shards = [[i for i in ids if shard.in_shard(i, index, 3)]
+            for index in (1, 2, 3)]
+        self.assertEqual(sorted(sum(shards, [])), ids)
+        for part in shards:
+            self.assertGreater(len(part), 250)
+
+
+class FileLockTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'entry.lock')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_exclusive(self):
+        first = shard.FileLock(self.path)
+        second = shard.FileLock(self.path)
+        self.assertTrue(first.acquire())
+        self.assertFalse(second.acquire())
+        first.release()
+        self.assertTrue(second.acquire())
+        second.release()
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_stale_owner(self):
+        with open(self.path, 'w') as f:
+            f.write('%s %d owner\n' % (socket.gethostname(), 2 ** 22 + 1))
+        lock = shard.FileLock(self.path)
+        self.assertTrue(lock.acquire())
+        self.assertEqual(lock.read(), lock.owner)
+
+    def test_stale_ttl(self):
+        with open(self.path, 'w') as f:
+            f.write('otherhost 1 owner\n')
+        self.assertFalse(shard.FileLock(self.path).acquire())
+        os.utime(self.path, (0, 0))
+        self.assertTrue(shard.FileLock(self.path).acquire())
+
+
+if __name__ == '__main__':
+    unittest.main()
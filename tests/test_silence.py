@@ -0,0 +1,33 @@
+"""Tests for `beetsplug.ydl.silence`
+"""
+
+import unittest
+
+from beetsplug.ydl import silence
+
+# silences as (start, end, level)
+GAPS = [
+    (0.0, 1.0, -90.0),
+    (40.0, 42.0, -80.0),
+    (55.0, 55.5, -50.0),
+    (77.0, 78.5, -70.0),
+    (127.0, 128.5, -90.0),
+]
+
+
+class SilenceTest(unittest.TestCase):
+
+    def test_pick_splits(self):
+        self.assertEqual(silence.pick_splits(GAPS, 128.5), [41.0, 77.75])
+
+    def test_pick_splits_count(self):
+        self.assertEqual(silence.pick_splits(GAPS, 128.5, 2), [41.0])
+        self.assertEqual(silence.pick_splits(GAPS, 128.5, 5), [])
+
+    def test_pick_splits_min_track(self):
+        self.assertEqual(silence.pick_splits(GAPS, 128.5, min_track=10),
+            [41.0, 55.25, 77.75])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+"""Tests for splitting tracks while downloading
+"""
+
+import unittest
+
+from beetsplug.ydl import YdlPlugin
+
+DESCRIPTION = '0:00 First\n0:30 Second\n1:00 Third\n'
+
+
+def get_entry_info(**kwargs):
+    info = {
+        'id': 'stream00001',
+        'protocol': 'https',
+        'url': 'https://example.com/stream00001.webm',
+        'acodec': 'opus',
+        'duration': 90,
+        'description': DESCRIPTION,
+    }
+    info.update(kwargs)
+    return info
+
+
+class StreamTest(unittest.TestCase):
+
+    def setUp(self):
+        self.plugin = YdlPlugin()
+        self.plugin.config.update({
+            'stream_split': True,
+            'split_files': True,
+            'write_dummy_mp3': False,
+        })
+
+    def test_can_stream(self):
+        self.plugin.entry_info = get_entry_info()
+        self.assertTrue(self.plugin.can_stream())
+
+    def test_can_stream_with_chapters(self):
+        # youtube-dl makes chapters from the description tracklist
+        self.plugin.entry_info = get_entry_info(chapters=[
+            {'start_time': 0, 'end_time': 30, 'title': 'First'},
+            {'start_time': 30, 'end_time': 60, 'title': 'Second'},
+            {'start_time': 60, 'end_time': 90, 'title': 'Third'},
+        ])
+        self.assertTrue(self.plugin.can_stream())
+
+    def test_can_stream_without_tracklist(self):
+        self.plugin.entry_info = get_entry_info(description='No tracks')
+        self.assertFalse(self.plugin.can_stream())
+
+    def test_can_stream_separate_formats(self):
+        self.plugin.entry_info = get_entry_info(
+            requested_formats=[{}, {}])
+        self.assertFalse(self.plugin.can_stream())
+
+
+if __name__ == '__main__':
+    unittest.main()
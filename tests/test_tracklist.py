@@ -0,0 +1,99 @@
+"""Golden output tests for `beetsplug.ydl.tracklist`
+
+Every `tracklist/<name>.json` source in the corpus is parsed and compared
+with `tracklist/golden/<name>.json`. Run with `YDL_UPDATE_GOLDEN=1` to write
+the golden files again after an intended change.
+"""
+
+import glob
+import json
+import os
+import unittest
+
+from beetsplug.ydl import tracklist
+
+CORPUS_DIR = os.path.join(os.path.dirname(__file__), 'tracklist')
+GOLDEN_DIR = os.path.join(CORPUS_DIR, 'golden')
+
+
+def load_corpus():
+    corpus = {}
+    for path in sorted(glob.glob(os.path.join(CORPUS_DIR, '*.json'))):
+        name = os.path.splitext(os.path.basename(path))[0]
+        with open(path) as f:
+            corpus[name] = json.load(f)
+
+    return corpus
+
+
+def parse(source):
+    """Parse a corpus source the same way the plugin does
+    """
+    title, fullalbum = tracklist.strip_fullalbum(source['title'])
+    year, title = tracklist.get_year(title)
+    artist, album = tracklist.parse_title(title)
+    tracks, skipped = tracklist.parse_tracklist(source['description'],
+        source['duration'])
+
+    return {
+        'title': title,
+        'fullalbum': fullalbum,
+        'year': year,
+        'artist': artist,
+        'album': album,
+        'tracks': tracks,
+        'skipped': skipped,
+    }
+
+
+class TracklistGoldenTest(unittest.TestCase):
+
+    def test_corpus(self):
+        for name, source in load_corpus().items():
+            golden_file = os.path.join(GOLDEN_DIR, name + '.json')
+            result = parse(source)
+
+            if os.getenv('YDL_UPDATE_GOLDEN'):
+                with open(golden_file, 'w') as f:
+                    json.dump(result, f, indent=4)
+                    f.write('\n')
+
+            with open(golden_file) as f:
+                golden = json.load(f)
+
+            with self.subTest(name=name):
+                self.assertEqual(json.loads(json.dumps(result)), golden)
+
+
+class TracklistTest(unittest.TestCase):
+
+    def test_to_seconds(self):
+        self.assertEqual(tracklist.to_seconds('03:25'), 205)
+        self.assertEqual(tracklist.to_seconds('1:02:03'), 3723)
+
+    def test_to_hms(self):
+        self.assertEqual(tracklist.to_hms(3723), '1:02:03')
+
+    def test_range_end_time(self):
+        tracks, skipped = tracklist.parse_tracklist(
+            'One 0:00 - 1:00\nTwo 1:30 - 2:00', 300)
+        self.assertEqual([(t['start'], t['end']) for t in tracks],
+            [(0, 60), (90, 120)])
+        self.assertEqual(skipped, [])
+
+    def test_trailing_time(self):
+        tracks, skipped = tracklist.parse_tracklist('First 0:00\nSecond 2:00',
+            300)
+        self.assertEqual([t['title'] for t in tracks], ['First', 'Second'])
+        self.assertEqual(tracks[0]['end'], 119.95)
+        self.assertEqual(tracks[1]['end'], 300)
+
+    def test_track_titles(self):
+        self.assertEqual(tracklist.parse_track_titles(
+            'Recorded 1999.\n\n1. One\n2) Two\n03 - Three\n\n2. More'),
+            ['One', 'Two', 'Three'])
+        self.assertEqual(tracklist.parse_track_titles('1. Alone'), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
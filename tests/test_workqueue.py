@@ -0,0 +1,47 @@
+"""Tests for `beetsplug.ydl.workqueue`
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from beetsplug.ydl.workqueue import WorkQueue
+
+
+class WorkQueueTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.queue = WorkQueue(os.path.join(self.tmpdir, 'queue.db'))
+
+    def tearDown(self):
+        self.queue.close()
+        shutil.rmtree(self.tmpdir)
+
+    def test_deduplicate(self):
+        get_id = lambda url: url.split('/')[-1]
+        urls = ['a/1', 'b/1', 'a/2', 'a/2', 'a/3']
+        self.assertEqual(self.queue.add_all(urls, get_id=get_id,
+            is_done=lambda entry_id: entry_id == '3'), 2)
+        self.assertEqual(self.queue.add_all(urls, get_id=get_id), 0)
+        self.assertEqual(self.queue.counts(), {'pending': 2, 'done': 1,
+            'duplicate': 1})
+
+    def test_priority(self):
+        self.queue.add_all(['low', 'other'])
+        self.queue.add_all(['high'], priority=10)
+        claimed = [self.queue.claim('worker') for i in range(4)]
+        self.assertEqual(claimed, ['high', 'low', 'other', None])
+
+    def test_requeue_stale(self):
+        self.queue.add_all(['url'])
+        self.assertEqual(self.queue.claim('gone'), 'url')
+        self.assertIsNone(self.queue.claim('worker', ttl=60))
+        self.assertEqual(self.queue.claim('worker', ttl=-1), 'url')
+        self.queue.done('url')
+        self.assertEqual(self.queue.counts(), {'done': 1})
+
+
+if __name__ == '__main__':
+    unittest.main()